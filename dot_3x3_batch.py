@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Batch simulation of random games with NumPy
+
+Plays many games of random lines at once. Each game is a row in a few
+NumPy arrays and one call to step() adds a line to every game, applying the
+rules of dot_3x3_logic: a player who completes a square captures it and
+moves again, otherwise control passes to the other player.
+
+A game of random lines adds the free lines in a random order, so the order
+of every game is drawn up front, as a random permutation of its lines.
+
+Requires NumPy.
+"""
+import numpy as np
+
+from dot_nxm_logic import line_count
+from dot_nxm_logic import square_count
+from dot_nxm_logic import square_masks
+
+# Games simulated together by simulate()
+CHUNK = 1 << 18
+
+# Boards with at most this many lines use a table of completed squares
+# indexed by bitboard
+_TABLE_LINES = 16
+
+
+def _completed_table(rows, cols):
+    """(int, int) -> numpy.ndarray
+    Returns the number of completed squares of every bitboard on a board of
+    <rows> x <cols> dots
+    """
+    positions = np.arange(1 << line_count(rows, cols), dtype=np.uint32)
+    table = np.zeros(len(positions), dtype=np.int8)
+
+    for mask in square_masks(rows, cols):
+        table += (positions & mask) == mask
+
+    return table
+
+
+class BatchGames:
+    """<count> games on a board of <rows> x <cols> dots, all starting from
+    the position <start> (a bitboard) with player X to move.
+
+        lines   - bitboard of each game
+        turn    - 0 where player X is to move, 1 where player Y is
+        x_count - squares captured by player X since <start>
+        y_count - squares captured by player Y since <start>
+    """
+
+    def __init__(self, count, rows=3, cols=3, start=0, seed=None):
+        lines = line_count(rows, cols)
+
+        if lines > 63:
+            raise ValueError('Board too large for 64-bit bitboards')
+
+        self.rows = rows
+        self.cols = cols
+        self.moves = 0
+
+        if lines <= 16:
+            dtype = np.uint16
+        elif lines <= 32:
+            dtype = np.uint32
+        else:
+            dtype = np.uint64
+
+        self._bits = np.left_shift(np.ones(lines, dtype=dtype),
+                                   np.arange(lines, dtype=dtype))
+        self._masks = np.array(square_masks(rows, cols), dtype=dtype)
+        self._table = _completed_table(rows, cols) \
+                if lines <= _TABLE_LINES else None
+
+        self.lines = np.full(count, start, dtype=dtype)
+        self.turn = np.zeros(count, dtype=np.uint8)
+        self.x_count = np.zeros(count, dtype=np.int16)
+        self.y_count = np.zeros(count, dtype=np.int16)
+
+        # Random order of each game's free lines; lines present at the start
+        # sort last and are never played
+        rng = np.random.default_rng(seed)
+        keys = rng.random((count, lines), dtype=np.float32)
+        keys[:, (start & self._bits) != 0] = 2.0
+        self._order = np.argsort(keys, axis=1).astype(np.uint8)
+        self._free = lines - bin(start).count('1')
+
+    def done(self):
+        """() -> bool
+        Returns True once every line of every game exists
+        """
+        return self.moves >= self._free
+
+    def _completed(self, lines):
+        """(numpy.ndarray) -> numpy.ndarray
+        Returns the number of completed squares of each bitboard in <lines>
+        """
+        if self._table is not None:
+            return self._table[lines]
+
+        completed = np.zeros(len(lines), dtype=np.int8)
+        for mask in self._masks:
+            completed += (lines & mask) == mask
+        return completed
+
+    def step(self):
+        """
+        Adds the next line to every game
+        """
+        before = self.lines
+        after = before | self._bits[self._order[:, self.moves]]
+        gained = self._completed(after) - self._completed(before)
+
+        # Captures go to the player to move, who then keeps the turn
+        self.x_count += gained * (self.turn == 0)
+        self.y_count += gained * (self.turn == 1)
+        self.turn ^= (gained == 0).view(np.uint8)
+
+        self.lines = after
+        self.moves += 1
+
+    def play_out(self):
+        """
+        Adds lines until every game is over
+        """
+        while not self.done():
+            self.step()
+
+    def margins(self):
+        """() -> numpy.ndarray
+        Returns player X's squares minus player Y's squares for each game
+        """
+        return self.x_count.astype(np.int32) - self.y_count
+
+
+def simulate(games, rows=3, cols=3, start=0, seed=None):
+    """(int, int, int, int, int) -> numpy.ndarray
+    Plays <games> random games on a board of <rows> x <cols> dots from the
+    position <start>, CHUNK games at a time.
+    Returns the histogram of the final margins, player X's squares minus
+    player Y's: element i counts the games that ended with margin
+    i - squares, where squares is the number of squares on the board
+    """
+    squares = square_count(rows, cols)
+    histogram = np.zeros(2 * squares + 1, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+
+    while games > 0:
+        count = min(games, CHUNK)
+        batch = BatchGames(count, rows, cols, start, rng.integers(1 << 63))
+        batch.play_out()
+        histogram += np.bincount(batch.margins() + squares,
+                                 minlength=len(histogram))
+        games -= count
+
+    return histogram
+
+
+def outcomes(histogram):
+    """(numpy.ndarray) -> numpy.ndarray
+    Returns the number of games won by player X, drawn and won by player Y,
+    from a histogram of margins returned by simulate()
+    """
+    squares = len(histogram) // 2
+    return np.array([histogram[squares + 1:].sum(), histogram[squares],
+                     histogram[:squares].sum()])
@@ -78,107 +78,553 @@ name (a string) as shown here:
 The string 'X' represents player X, and the string 'Y' represents playey Y. 
 
 """
+import random
+from array import array
+from collections import namedtuple
+
 # NOTE:
 # ----------------------------------------------------------------------------
-# Global vars (private) - maintain the state of the game. prefix vars with
-#       underscores to dicourage access outside this module.
+# Each game is a GameState object. The module-level functions operate on a
+#       default game so that a caller playing a single game needs no objects.
 # ----------------------------------------------------------------------------
-# Boolean vars that keep track of whether or not a line exists between two 
-#       dots. E.g. If _n_nw is True, the line identifeid as 'North_Northwest'
-#       exists.
+# The board is held as a bitboard. Every line owns one bit of the int lines;
+#       if the bit is set, the line exists. E.g. If bit 0 of lines is set,
+#       the line identified as 'North_Northwest' exists.
 # ----------------------------------------------------------------------------
-#       @----_n_nw---@---_n_ne---@
-#       |            |           |        
-#     _w_nw         _n_c       _e_ne
+#       @-----0------@-----1-----@
+#       |            |           |
+#       6            7           8
 #       |            |           |
-#       @----_w_c----@----_e_c---@
+#       @-----2------@-----3-----@
 #       |            |           |
-#     _w_sw         _s_c       _e_se
+#       9           10          11
 #       |            |           |
-#       @---_s_sw----@---_s_se___@
+#       @-----4------@-----5-----@
+#
+# Horizontal lines are numbered first (row by row), then vertical lines.
+# Squares are numbered 0 ('top_left') to 3 ('bottom_right') row by row.
+# ----------------------------------------------------------------------------
+# Every move is pushed onto a history, so it can be taken back in constant
+#       time, and the position carries a Zobrist hash: the XOR of a random
+#       64-bit key for every line present, every owned square (one key per
+#       square and owner) and the player to move if it is Y. A move updates
+#       the hash with a few XORs instead of rehashing the board.
+# ----------------------------------------------------------------------------
+# A game announces what each move changes as events (LineAdded,
+#       SquareCaptured, ...) to the listeners subscribed to it, so a
+#       front-end can redraw only what changed. A game without listeners
+#       builds no events.
+# ----------------------------------------------------------------------------
 
+# Line names in bit order - bit i of _lines is the line LINE_NAMES[i]
+LINE_NAMES = ('North_Northwest', 'North_Northeast',
+              'West_Center', 'East_Center',
+              'South_Southwest', 'South_Southeast',
+              'West_Northwest', 'North_Center', 'East_Northeast',
+              'West_Southwest', 'South_Center', 'East_Southeast')
+
+# Square names in bit order
+SQUARE_NAMES = ('top_left', 'top_right', 'bottom_left', 'bottom_right')
+
+# Players in turn order - _turn indexes this tuple
+_PLAYERS = ('X', 'Y')
+
+# Lookup tables: name -> index and name -> bit (line), name -> index (square)
+_LINE_INDEX = {name: i for i, name in enumerate(LINE_NAMES)}
+_LINE_BIT = {name: 1 << i for i, name in enumerate(LINE_NAMES)}
+_SQUARE_INDEX = {name: i for i, name in enumerate(SQUARE_NAMES)}
+
+# Bitmask of the four lines that complete each square
+_SQUARE_MASK = (0b000011000101,    # top_left: 0, 2, 6, 7
+                0b000110001010,    # top_right: 1, 3, 7, 8
+                0b011000010100,    # bottom_left: 2, 4, 9, 10
+                0b110000101000)    # bottom_right: 3, 5, 10, 11
+
+# Squares each line borders, by line index - a new line can only ever
+# complete these (one or two) squares
+_LINE_SQUARES = tuple(
+    tuple(sq for sq, mask in enumerate(_SQUARE_MASK) if mask & (1 << i))
+    for i in range(len(LINE_NAMES)))
+
+# Number of squares owned for each 4-bit ownership mask
+_SQUARE_COUNT = tuple(bin(mask).count('1') for mask in range(16))
+
+# Bitmask of all the lines
+_FULL = (1 << len(LINE_NAMES)) - 1
+
+def move_kinds(bordering, lines, free):
+    """(sequence, int, int) -> tuple
+    Returns the masks (capturing, safe, giving) sorting the lines of <free>
+    added to position <lines>: those that complete a square, those that
+    neither complete a square nor give one away (leave a bordering square
+    with three sides), and those that give one away. <bordering> holds the
+    masks of the squares each line borders, as dot_nxm_logic.bordering_masks
+    returns them, so this works on a board of any size
+    """
+    capturing = safe = giving = 0
+
+    while free:
+        bit = free & -free
+        free ^= bit
+        after = lines | bit
+        gives = False
+
+        for mask in bordering[bit.bit_length() - 1]:
+            missing = mask & ~after
+            if not missing:
+                capturing |= bit
+                break
+            elif not missing & (missing - 1):
+                gives = True
+        else:
+            if gives:
+                giving |= bit
+            else:
+                safe |= bit
 
-# Init Line status (exists) - Initally, no lines exist anywhere (False)
-_n_nw, _n_ne, _n_c = False, False, False
-_w_nw, _w_sw, _w_c = False, False, False
-_e_ne, _e_se, _e_c = False, False, False
-_s_sw, _s_se, _s_c = False, False, False
+    return capturing, safe, giving
 
-# Init Current player - A string, 'X' for player X or 'Y' for player Y
-_current_player = 'X'
+# Masks of the squares each line borders, by line index
+_BORDERING = tuple(tuple(_SQUARE_MASK[sq] for sq in squares)
+                   for squares in _LINE_SQUARES)
 
-# Init square ownership as None
-# A string reps ownership, 'X' for player X or 'Y' for player Y
-_top_left_owner, _top_right_owner = None, None
-_bottom_left_owner, _bottom_right_owner = None, None
+def _move_masks(lines):
+    """(int) -> tuple
+    Returns the masks of the free lines of position <lines> that complete a
+    square and of those that neither complete a square nor give one away
+    """
+    capturing, safe, _ = move_kinds(_BORDERING, lines, _FULL & ~lines)
+    return capturing, safe
+
+# Capturing and safe moves of every position, indexed by its bitboard
+_CAPTURING = array('H', bytes(2 << len(LINE_NAMES)))
+_SAFE = array('H', bytes(2 << len(LINE_NAMES)))
+
+for _lines in range(_FULL + 1):
+    _CAPTURING[_lines], _SAFE[_lines] = _move_masks(_lines)
+del _lines
+
+# Line indexes in every mask of lines, in increasing order
+_MASK_LINES = tuple(tuple(i for i in range(len(LINE_NAMES)) if mask >> i & 1)
+                    for mask in range(_FULL + 1))
+
+# Zobrist keys, drawn from a fixed seed so hashes are the same in every
+# process: one per line, one per square for each owner, and one for player Y
+# to move. dot_nxm_logic.zobrist_keys(3, 3) draws the same keys
+_random = random.Random('dots 3x3')
+_LINE_KEYS = tuple(_random.getrandbits(64) for _ in LINE_NAMES)
+_SQUARE_KEYS = tuple(tuple(_random.getrandbits(64) for _ in SQUARE_NAMES)
+                     for _ in _PLAYERS)
+_TURN_KEY = _random.getrandbits(64)
+del _random
+
+def _capture_keys(keys):
+    """(tuple) -> tuple
+    Returns, for every 4-bit mask of squares, the XOR of the <keys> of the
+    squares in the mask
+    """
+    table = [0] * 16
+    for mask in range(1, 16):
+        low = mask & -mask
+        table[mask] = table[mask ^ low] ^ keys[low.bit_length() - 1]
+    return tuple(table)
+
+# Hash change for capturing each 4-bit mask of squares, by player
+_CAPTURE_KEYS = tuple(_capture_keys(keys) for keys in _SQUARE_KEYS)
 
 ##############################################################################
-# Note: Private Functions (prefixed with underscore)
-# Functions accessed only within this module
+# NOTE: Events announced to the listeners of a game
 #-----------------------------------------------------------------------------
 
-def _update_square(sq):	
-    """(str) -> bool
-    Updates the owner of square <sq>, if possible.
-    <sq> must one of the strings; 'top_left', 'top_right', 'bottom_left',
-    or 'bottom_right'. 
-    Function Checks to see:
-        1. If the square currently is not owned by a player and
-        2. if all the lines are in place to complete the sqaure.
-    
-    If both conditions are met, it marks the square with the current player
-    and returns True. 
-    If one of the players already owns the square, or if not all lines exist 
-    to complete the square, returns False. 		
-    """
-    # Declare global vars affected by function
-    global _top_left_owner, _top_right_owner, _bottom_left_owner, \
-            _bottom_right_owner
-    
-    if sq == 'top_left' and _top_left_owner == None and _n_nw and _n_c and \
-            _w_c and _w_nw: 
-        _top_left_owner = _current_player 
-        return True
-    
-    elif sq == 'top_right' and _top_right_owner == None and _n_ne and _e_ne \
-            and _e_c and _n_c:
-        _top_right_owner = _current_player
-        return True
+LineAdded = namedtuple('LineAdded', 'line player')
+LineAdded.__doc__ = """<player> added the line <line>"""
 
-    elif sq == 'bottom_left' and _bottom_left_owner == None and _w_c and _s_c \
-            and _s_sw and _w_sw:
-        _bottom_left_owner = _current_player
-        return True
+SquareCaptured = namedtuple('SquareCaptured', 'square player')
+SquareCaptured.__doc__ = """<player> captured the square <square>"""
 
-    elif sq == 'bottom_right' and _bottom_right_owner == None and _e_c and \
-            _e_se and _s_se and _s_c:
-        _bottom_right_owner = _current_player
-        return True
+TurnChanged = namedtuple('TurnChanged', 'player')
+TurnChanged.__doc__ = """<player> is to move next"""
 
-    else:
-        return False # Ownership unchanged
+GameOver = namedtuple('GameOver', 'winner')
+GameOver.__doc__ = """Every square is owned; <winner> is 'X', 'Y' or 'Draw'"""
 
-def _update_squares():
-    """() ->  bool
-    Attepts to update the owners of all the squares that a new line might 
-    affect. 
-    
-    Returns True if one or more squares receives a new owner, otherwise False
-    """
-    top_left = _update_square('top_left')
-    top_right = _update_square('top_right')
-    bottom_left = _update_square('bottom_left')
-    bottom_right = _update_square('bottom_right')
-    
-    return top_left or top_right or bottom_left or bottom_right
+LineRemoved = namedtuple('LineRemoved', 'line player squares')
+LineRemoved.__doc__ = """The line <line> added by <player> was taken back,
+freeing the squares <squares> (a tuple of names) it had captured"""
+
+GameReset = namedtuple('GameReset', '')
+GameReset.__doc__ = """The board was cleared for a new game"""
 
 ##############################################################################
+# NOTE: The game state
+#-----------------------------------------------------------------------------
+
+class GameState:
+    """The state of one connect the dots game.
+
+    Holds the lines, the square owners and the player to move in three small
+    ints, so thousands of games can be kept alive side by side:
+        lines  - bit i is set if the line LINE_NAMES[i] exists
+        owners - bit i is set if player X owns square i, and bit i + 4 is
+                 set if player Y owns square i
+        turn   - 0 if player X is to move, 1 if player Y is to move
+    The number of squares each player owns is kept alongside, so the winner
+    can be declared without counting.
+
+    Each move is kept as one int in the history (line index, the player who
+    moved and the squares captured), which is all undo_line() needs to take
+    it back. Undone lines wait on a redo stack until another line is added.
+
+    Callables passed to subscribe() are called with an event for every
+    change: a move announces LineAdded, then SquareCaptured for each square
+    it completes, then TurnChanged if the other player moves next, or
+    GameOver if the board is full.
+    """
+    __slots__ = ('_lines', '_owners', '_turn', '_x_count', '_y_count',
+                 '_hash', '_history', '_redo', '_listeners')
+
+    def __init__(self):
+        self._listeners = None  # List of listeners, None if there are none
+        self.reset()
+
+    def __repr__(self):
+        return 'GameState(lines={0:#05x}, owners={1:#04x}, player={2!r})' \
+                .format(self._lines, self._owners, self.current_player())
+
+    @property
+    def lines(self):
+        """Bitboard of the lines on the board"""
+        return self._lines
+
+    @property
+    def owners(self):
+        """Packed square ownership; X in the low nibble, Y in the high one"""
+        return self._owners
+
+    @property
+    def zobrist(self):
+        """64-bit Zobrist hash of the lines, the square owners and the player
+        to move"""
+        return self._hash
+
+    def _update_squares(self, index):
+        """(int) ->  int
+        Attepts to update the owners of the squares bordering the new line
+        <index>. A square is captured by the current player when all four of
+        its lines exist; since the new line is one of them, nobody can own
+        the square yet.
+
+        Returns the mask of the squares that receive a new owner, 0 if there
+        are none
+        """
+        lines = self._lines
+        captured = 0
+
+        for sq in _LINE_SQUARES[index]:
+            mask = _SQUARE_MASK[sq]
+            if lines & mask == mask:
+                captured |= 1 << sq
+
+        if not captured:
+            return 0
+
+        # Mark the captured squares with the current player
+        self._owners |= captured << (4 * self._turn)
+        self._hash ^= _CAPTURE_KEYS[self._turn][captured]
+
+        if self._turn:
+            self._y_count += _SQUARE_COUNT[captured]
+        else:
+            self._x_count += _SQUARE_COUNT[captured]
+
+        return captured
+
+    def _play(self, index):
+        """(int) -> NoneType
+        Adds the absent line <index> and records the move in the history
+        """
+        turn = self._turn
+        self._lines |= 1 << index
+        self._hash ^= _LINE_KEYS[index]
+
+        # If line added succesfully, check whether it completes square
+        captured = self._update_squares(index)
+
+        if not captured:
+            # Turn move to next player upoun a successful move
+            self._turn ^= 1
+            self._hash ^= _TURN_KEY
+
+        self._history.append(index | turn << 4 | captured << 5)
+
+        if self._listeners is not None:
+            self._announce_move(index, turn, captured)
+
+    def subscribe(self, listener):
+        """(callable) -> callable
+        Calls <listener> with every event of the game from now on, unless
+        it is subscribed already. Returns <listener>
+        """
+        if self._listeners is None:
+            self._listeners = []
+
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+        return listener
+
+    def unsubscribe(self, listener):
+        """(callable) -> NoneType
+        Stops calling <listener> with the events of the game
+        """
+        if self._listeners is not None and listener in self._listeners:
+            self._listeners.remove(listener)
+            if not self._listeners:
+                self._listeners = None
+
+    def _publish(self, events):
+        """(list) -> NoneType
+        Calls every listener with each of <events> in turn
+        """
+        listeners = tuple(self._listeners)
+
+        for event in events:
+            for listener in listeners:
+                listener(event)
+
+    def _announce_move(self, index, turn, captured):
+        """(int, int, int) -> NoneType
+        Publishes the events of the move that added line <index> for player
+        <turn> and captured the squares in the mask <captured>
+        """
+        player = _PLAYERS[turn]
+        events = [LineAdded(LINE_NAMES[index], player)]
+
+        for sq, name in enumerate(SQUARE_NAMES):
+            if captured >> sq & 1:
+                events.append(SquareCaptured(name, player))
+
+        if not captured:
+            events.append(TurnChanged(_PLAYERS[self._turn]))
+        elif self._x_count + self._y_count == len(SQUARE_NAMES):
+            events.append(GameOver(self.winner()))
+
+        self._publish(events)
+
+    def add_line(self, line):
+        """(str) -> bool
+        Attempts to add a line between two dots.
+        The parameter <line> must be one of 'North_Northeast',
+        'North_Northwest', 'East_Center', etc, (A string represnting a line
+        on the game board)
+
+        If the line is not present, adds the line and returns True.
+        If the line is already present, no change to state of game board and
+        returns False
+        """
+        index = _LINE_INDEX.get(line)
+
+        if index is None or self._lines & (1 << index):
+            return False    # Unknown line or line already present
+
+        self._play(index)
+
+        # Adding the next undone line keeps the rest of the redo stack;
+        # any other line abandons it
+        redo = self._redo
+        if redo:
+            if redo[-1] == index:
+                redo.pop()
+            else:
+                redo.clear()
+
+        return True
+
+    def undo_line(self):
+        """() -> str or NoneType
+        Takes back the last line added, restoring the owners of the squares
+        it completed and the player to move.
+
+        Returns the name of the line removed, or None if no line was added
+        """
+        if not self._history:
+            return None
+
+        move = self._history.pop()
+        index = move & 15
+        turn = move >> 4 & 1
+        captured = move >> 5
+
+        self._lines ^= 1 << index
+        self._hash ^= _LINE_KEYS[index]
+
+        if captured:
+            self._owners ^= captured << (4 * turn)
+            self._hash ^= _CAPTURE_KEYS[turn][captured]
+            if turn:
+                self._y_count -= _SQUARE_COUNT[captured]
+            else:
+                self._x_count -= _SQUARE_COUNT[captured]
+        else:
+            self._hash ^= _TURN_KEY
+
+        self._turn = turn
+        self._redo.append(index)
+
+        if self._listeners is not None:
+            events = [LineRemoved(LINE_NAMES[index], _PLAYERS[turn],
+                                  tuple(name for sq, name in
+                                        enumerate(SQUARE_NAMES)
+                                        if captured >> sq & 1))]
+            if not captured:
+                events.append(TurnChanged(_PLAYERS[turn]))
+            self._publish(events)
+
+        return LINE_NAMES[index]
+
+    def redo_line(self):
+        """() -> str or NoneType
+        Adds back the line last taken back by undo_line()
+
+        Returns the name of the line added, or None if there is nothing to
+        redo
+        """
+        if not self._redo:
+            return None
+
+        index = self._redo.pop()
+        self._play(index)
+        return LINE_NAMES[index]
+
+    def legal_moves(self):
+        """() -> int
+        Returns the bitmask of the lines that can still be added; bit i is
+        set if the line LINE_NAMES[i] is free
+        """
+        return _FULL & ~self._lines
+
+    def capturing_moves(self):
+        """() -> int
+        Returns the bitmask of the free lines that complete a square
+        """
+        return _CAPTURING[self._lines]
+
+    def safe_moves(self):
+        """() -> int
+        Returns the bitmask of the free lines that neither complete a square
+        nor give one away, i.e. leave no bordering square with three lines
+        """
+        return _SAFE[self._lines]
+
+    def line_indexes(self, mask=None):
+        """(int) -> tuple
+        Returns the indexes of the lines in the bitmask <mask>, by default
+        the legal moves, in increasing order. The tuple is precomputed, so
+        iterating over it allocates nothing
+        """
+        if mask is None:
+            mask = _FULL & ~self._lines
+
+        return _MASK_LINES[mask & _FULL]
+
+    def square_owner(self, sq):
+        """ (str) -> str or NoneType
+        Checks who owns the given square <sq>
+        <sq> must be one of the strings, 'top_left', 'top_right',
+        'bottom_right' or 'bottom_left'
+
+        Returns the player who owns the given square, and None if no-one
+        owns it
+        """
+        index = _SQUARE_INDEX.get(sq)
+
+        if index is None:
+            return None
+
+        elif self._owners & (1 << index):
+            return 'X'
+
+        elif self._owners & (16 << index):
+            return 'Y'
+
+        else:
+            return None
+
+    def check_line(self, line):
+        """(str) -> bool
+        Checks whether the line <line> exists.
+        The parameter <line> must be one of 'North_Northeast',
+        'North_Northwest', 'East_Center', etc, (A string represnting a line
+        on the game board)
+
+        Returns True if the line exists on the game board, otherwise False if
+        it doesn't exist yet
+        """
+        return self._lines & _LINE_BIT.get(line, 0) != 0
+
+    def score(self):
+        """() -> tuple
+        Returns the number of squares owned by player X and by player Y
+        """
+        return self._x_count, self._y_count
+
+    def winner(self):
+        """() -> str or NoneType
+        Declares the game's winner, player X, player Y or a draw
+
+        Returns 'X' or 'Y', or 'Draw' if the game board is full and  both
+        players each own two squares.
+        Reurns None if open squares still exist, and so the game can continue
+        """
+        x_count, y_count = self._x_count, self._y_count
+
+        if x_count + y_count == 4: # All squares filled
+            if x_count > y_count:
+                return 'X'  # Player X won
+
+            elif x_count < y_count:
+                return 'Y'  # Player Y won
+
+            else:
+                return 'Draw' # Tied game
+
+        else:
+            return None     # No Winner or draw; game continues
+
+    def reset(self):
+        """
+        Makes the playing board ready for a new game.
+            1. Clears all the lines from the board,
+            2. makes all the squares empty, and
+            3. sets the current player to X
+        Does not return a value to the caller
+        """
+        self._lines = 0     # Clear all the lines
+        self._owners = 0    # Clear all the squares
+        self._turn = 0      # Init current player - X always starts
+        self._x_count = self._y_count = 0
+        self._hash = 0
+        self._history = []  # One int per move, see undo_line()
+        self._redo = []     # Line indexes taken back, last on top
+
+        if self._listeners is not None:
+            self._publish([GameReset()])
+
+    def current_player(self):
+        """() -> str
+        Returns the player whose turn it is to move
+        """
+        return _PLAYERS[self._turn]
 
 ##############################################################################
 # NOTE: Functions that reveal or control the state of the current game.
-# These functions are meant to be accessed outside of this module
+# These functions are meant to be accessed outside of this module and play
+# the default game
 #-----------------------------------------------------------------------------
 
+# The game played through the module-level functions
+_game = GameState()
+
 def add_line(line):
     """(str) -> bool
     Attempts to add a line between two dots. 
@@ -189,69 +635,27 @@ def add_line(line):
     If the line is already present, no change to state of game board and
     returns False
     """
-    # Declare global vars the func may affect maintaining the game-state
-    global _n_nw, _n_c, _n_ne, _s_c, _s_se, _s_sw, _e_c, _e_se, _e_ne, \
-            _w_c, _w_sw, _w_nw, _current_player
-    
-    line_added = False  # Init unsuccessful by defaulr
-    
-    if line == 'North_Northwest' and not _n_nw:
-        _n_nw = True
-        line_added = True
-    
-    elif line == 'North_Center' and not _n_c:
-        _n_c = True
-        line_added = True
-
-    elif line == 'North_Northeast' and not _n_ne:
-        _n_ne = True
-        line_added = True
-
-    elif line == 'South_Center' and not _s_c:
-        _s_c = True
-        line_added = True
-
-    elif line == 'South_Southeast' and not _s_se:
-        _s_se = True
-        line_added = True
+    return _game.add_line(line)
 
-    elif line == 'South_Southwest' and not _s_sw:
-        _s_sw = True
-        line_added = True
-
-    elif line == 'East_Center' and not _e_c:
-        _e_c = True
-        line_added = True
-
-    elif line == 'East_Southeast' and not _e_se:
-        _e_se = True
-        line_added = True
-
-    elif line == 'East_Northeast' and not _e_ne:
-        _e_ne = True
-        line_added = True
-
-    elif line == 'West_Northwest' and not _w_nw:
-        _w_nw = True
-        line_added = True
+def legal_moves():
+    """() -> int
+    Returns the bitmask of the lines that can still be added; bit i is set
+    if the line LINE_NAMES[i] is free
+    """
+    return _game.legal_moves()
 
-    elif line == 'West_Southwest' and not _w_sw:
-        _w_sw = True
-        line_added = True
+def capturing_moves():
+    """() -> int
+    Returns the bitmask of the free lines that complete a square
+    """
+    return _game.capturing_moves()
 
-    elif line == 'West_Center' and not _w_c:
-        _w_c = True
-        line_added = True
-    
-    # If line added succesfully, check whether it completes square
-    if line_added and not _update_squares():
-        # Turn move to next player upoun a successful move
-        if _current_player == 'X':
-            _current_player = 'Y'
-        else:
-            _current_player = 'X'
-    
-    return line_added
+def safe_moves():
+    """() -> int
+    Returns the bitmask of the free lines that neither complete a square nor
+    give one away
+    """
+    return _game.safe_moves()
 
 def square_owner(sq):
     """ (str) -> str or NoneType
@@ -261,20 +665,7 @@ def square_owner(sq):
     
     Returns the player who owns the given square, and None if no-one owns it
     """
-    if sq == 'top_left':
-        return _top_left_owner
-    
-    elif sq == 'top_right':
-        return _top_right_owner
-    
-    elif sq == 'bottom_left':
-        return _bottom_left_owner
-    
-    elif sq == 'bottom_right':
-        return _bottom_right_owner
-
-    else:
-        return None
+    return _game.square_owner(sq)
 
 def check_line(line):
     """(str) -> bool
@@ -285,47 +676,40 @@ def check_line(line):
     Returns True if the line exists on the game board, otherwise False if it
     doesn't exist yet
     """
-    if line == 'North_Northwest':
-        return _n_nw 
-    
-    elif line == 'North_Center':
-        return _n_c
-
-    elif line == 'North_Northeast':
-        return _n_ne 
+    return _game.check_line(line)
 
-    elif line == 'South_Center':
-        return _s_c 
-
-    elif line == 'South_Southeast':
-        return _s_se
-
-    elif line == 'South_Southwest':
-        return _s_sw
-
-    elif line == 'East_Center':
-        return _e_c
-
-    elif line == 'East_Southeast':
-        return _e_se
+def undo_line():
+    """() -> str or NoneType
+    Takes back the last line added, restoring the owners of the squares it
+    completed and the player to move.
 
-    elif line == 'East_Northeast':
-        return _e_ne 
+    Returns the name of the line removed, or None if no line was added
+    """
+    return _game.undo_line()
 
-    elif line == 'West_Northwest':
-        return _w_nw 
+def redo_line():
+    """() -> str or NoneType
+    Adds back the line last taken back by undo_line()
 
-    elif line == 'West_Southwest':
-        return _w_sw 
+    Returns the name of the line added, or None if there is nothing to redo
+    """
+    return _game.redo_line()
 
-    elif line == 'West_Center':
-        return _w_c
+def subscribe(listener):
+    """(callable) -> callable
+    Calls <listener> with every event of the game (LineAdded,
+    SquareCaptured, TurnChanged, GameOver, LineRemoved or GameReset) from
+    now on, unless it is subscribed already. Returns <listener>
+    """
+    return _game.subscribe(listener)
 
-    else:
-        return False
+def unsubscribe(listener):
+    """(callable) -> NoneType
+    Stops calling <listener> with the events of the game
+    """
+    _game.unsubscribe(listener)
 
 def winner():
-# TODO: Fix Display
     """() -> str or NoneType
     Declares the game's winner, player X, player Y or a draw
     
@@ -333,45 +717,7 @@ def winner():
     each own two squares.
     Reurns None if open squares still exist, and so the game can continue
     """
-    # Init counter var for the players' squares
-    x_count, y_count = 0, 0
-
-    if _top_left_owner == 'X':
-        x_count += 1
-    
-    elif _top_left_owner == 'Y':
-        y_count += 1
-    
-    elif _top_right_owner == 'X':
-        x_count += 1
-
-    elif _top_right_owner == 'Y':
-        y_count += 1
-
-    elif _bottom_left_owner == 'X':
-        x_count += 1
-    
-    elif _bottom_left_owner == 'Y':
-        y_count += 1
-    
-    elif _bottom_right_owner == 'X':
-        y_count += 1
-    
-    elif _bottom_right_owner == 'Y':
-        y_count += 1
-
-    if x_count + y_count == 4: # All squares filled
-        if x_count > y_count:
-            return 'X'  # Player X won
-        
-        elif x_count < y_count:
-            return 'Y'  # Player Y won
-
-        else:
-            return 'Draw' # Tied game
-
-    else:
-        return None     # No Winner or draw; game continues
+    return _game.winner()
 
 def initialize_board():
     """
@@ -381,24 +727,16 @@ def initialize_board():
         3. sets the current player to X
     Does not return a value to the caller
     """
-    # Declare global vars the func may affect maintaining the game-state
-    global _n_nw, _n_c, _n_ne, _s_c, _s_se, _s_sw, _e_c, _e_se, _e_ne, _w_c, \
-            _w_sw, _w_nw, _current_player, _top_left_owner, _top_right_owner, \
-            _bottom_left_owner, _bottom_right_owner
-
-    # Init (line exists) to default state (False)
-    _n_nw = _n_c = _n_ne = _s_c = _s_se = _s_sw = _e_c = _e_se = _e_ne = \
-            _w_c = _w_sw = _w_nw = False
-
-    # Init/Clear all the squares to default state
-    _top_left_owner = _top_right_owner = _bottom_left_owner = \
-        _bottom_right_owner = None
-    
-    # Init current player - X always starts
-    _current_player = 'X'
+    _game.reset()
 
 def current_player():
     """() -> str
     Returns the player whose turn it is to move
     """
-    return _current_player
\ No newline at end of file
+    return _game.current_player()
+
+def default_game():
+    """() -> GameState
+    Returns the game played through the module-level functions
+    """
+    return _game
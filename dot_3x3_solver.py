@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Perfect play for the connect the dots game
+
+Solves the game exhaustively. What happens in the rest of a game depends
+only on which lines already exist, not on who owns the completed squares,
+so a position is identified by the bitboard of its lines (see
+dot_3x3_logic.GameState.lines). The 3x3 board has 2**12 of them.
+
+For every position the solver stores:
+    value - the best margin (own squares minus opponent's squares) the player
+            to move can get from the squares still open, and
+    move  - the line that achieves it, or -1 if the board is full
+
+The tables are filled bottom-up: adding a line only ever sets a bit, so every
+position after a move is numerically larger than the position before it.
+"""
+from array import array
+
+from dot_3x3_logic import LINE_NAMES
+from dot_3x3_logic import default_game
+from dot_nxm_logic import bordering_masks
+from dot_nxm_logic import line_count
+
+# Largest board (in lines) the solver accepts; the tables hold 2**lines
+# entries each
+MAX_LINES = 20
+
+
+class Solver:
+    """Transposition table holding the value and best move of every
+    position on a board of <rows> x <cols> dots
+    """
+    __slots__ = ('rows', 'cols', 'values', 'moves')
+
+    def __init__(self, rows=3, cols=3):
+        if line_count(rows, cols) > MAX_LINES:
+            raise ValueError('Board too large to solve exhaustively')
+
+        self.rows = rows
+        self.cols = cols
+        self.values, self.moves = _solve(rows, cols)
+
+    def value(self, lines):
+        """(int) -> int
+        Returns the margin the player to move gets from the open squares of
+        position <lines> under perfect play by both sides
+        """
+        return self.values[lines]
+
+    def best_line(self, lines):
+        """(int) -> int or NoneType
+        Returns the number of a best line to add in position <lines>, or
+        None if the board is full
+        """
+        move = self.moves[lines]
+        return move if move >= 0 else None
+
+
+def _solve(rows, cols):
+    """(int, int) -> tuple
+    Computes the value and best move tables for a board of <rows> x <cols>
+    dots
+    """
+    lines = line_count(rows, cols)
+    full = (1 << lines) - 1
+
+    # Squares bordering each line
+    bordering = bordering_masks(rows, cols)
+
+    values = array('b', bytes(full + 1))
+    moves = array('b', [-1]) * (full + 1)
+
+    for position in range(full - 1, -1, -1):
+        best_value, best_move = -128, -1
+        free = full & ~position
+
+        while free:
+            bit = free & -free
+            free ^= bit
+            line = bit.bit_length() - 1
+            after = position | bit
+
+            gained = 0
+            for mask in bordering[line]:
+                if after & mask == mask:
+                    gained += 1
+
+            # Completing a square keeps the turn, otherwise it passes over
+            if gained:
+                value = gained + values[after]
+            else:
+                value = -values[after]
+
+            if value > best_value:
+                best_value, best_move = value, line
+
+        values[position] = best_value
+        moves[position] = best_move
+
+    return values, moves
+
+
+# Solver for the 3x3 board, built on first use
+_solver = None
+
+def solver():
+    """() -> Solver
+    Returns the solver for the 3x3 board, solving the game the first time
+    """
+    global _solver
+
+    if _solver is None:
+        _solver = Solver()
+
+    return _solver
+
+def set_solver(table):
+    """(Solver) -> NoneType
+    Makes evaluate() and best_move() answer from <table>, any object with
+    the value() and best_line() methods of a 3x3 Solver, e.g. a table
+    loaded by dot_3x3_table
+    """
+    global _solver
+
+    _solver = table
+
+def evaluate(game=None):
+    """(GameState) -> int
+    Returns the final margin of squares, player X's minus player Y's, that
+    <game> ends with under perfect play by both sides.
+    Uses the game played by the dot_3x3_logic functions if <game> is None
+    """
+    if game is None:
+        game = default_game()
+
+    x_count, y_count = game.score()
+    value = solver().value(game.lines)
+
+    if game.current_player() == 'X':
+        return x_count - y_count + value
+    else:
+        return x_count - y_count - value
+
+def best_move(game=None):
+    """(GameState) -> str or NoneType
+    Returns the name of a best line for the current player of <game> to add,
+    or None if the board is full.
+    Uses the game played by the dot_3x3_logic functions if <game> is None
+    """
+    if game is None:
+        game = default_game()
+
+    line = solver().best_line(game.lines)
+
+    if line is None:
+        return None
+
+    return LINE_NAMES[line]
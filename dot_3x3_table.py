@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Precomputed perfect-play tables
+
+Stores the tables computed by dot_3x3_solver in a binary file so they are
+solved once and then shared by every process on a host. The file is mapped
+into memory, never read: looking a position up touches the page holding it
+and nothing else, and the operating system keeps a single copy of the pages
+however many processes map the file.
+
+File layout (little-endian):
+
+    offset  size  field
+    0       4     magic, b'DOTS'
+    4       2     format version (1)
+    6       1     rows of dots
+    7       1     columns of dots
+    8       4     number of lines on the board
+    12      4     number of positions (2 ** lines)
+    16      2*n   one record per position, indexed by its line bitboard:
+                  the value (signed byte) and the best line (signed byte,
+                  -1 if the board is full)
+
+A canonical table (format version 2) holds only the positions that are
+their own canonical form (see dot_symmetry), about one in eight on a square
+board. The number of positions at offset 12 counts those, and the records
+follow their sorted keys:
+
+    16      4*n   the canonical positions, uint32, in increasing order
+    16+4*n  2*n   one record per canonical position, in the same order;
+                  the best line is a line of the canonical position
+
+Looking a position up then takes its canonical form, a binary search over
+the keys, and the best line mapped back to the position.
+
+Usage:
+    python3 dot_3x3_table.py FILE [ROWS COLS] [--canonical]
+"""
+import bisect
+import mmap
+import struct
+import sys
+from array import array
+
+from dot_3x3_solver import Solver
+from dot_3x3_solver import set_solver
+from dot_nxm_logic import line_count
+from dot_symmetry import symmetry
+
+MAGIC = b'DOTS'
+VERSION = 1
+CANONICAL_VERSION = 2
+
+_HEADER = struct.Struct('<4sHBBII')
+
+
+def write_table(path, rows=3, cols=3, canonical=False):
+    """(str, int, int, bool) -> int
+    Solves the board of <rows> x <cols> dots and writes its table to the
+    file <path>, holding only canonical positions if <canonical> is True.
+    Returns the number of positions written
+    """
+    solver = Solver(rows, cols)
+
+    if canonical:
+        keys = array('I', symmetry(rows, cols).canonical_positions())
+        values = array('b', (solver.values[key] for key in keys))
+        moves = array('b', (solver.moves[key] for key in keys))
+        version = CANONICAL_VERSION
+    else:
+        keys = array('I')
+        values, moves = solver.values, solver.moves
+        version = VERSION
+
+    count = len(values)
+    records = bytearray(2 * count)
+    records[0::2] = values.tobytes()
+    records[1::2] = moves.tobytes()
+
+    with open(path, 'wb') as table_file:
+        table_file.write(_HEADER.pack(MAGIC, version, rows, cols,
+                                      line_count(rows, cols), count))
+        table_file.write(keys.tobytes())
+        table_file.write(records)
+
+    return count
+
+
+class Table:
+    """Read-only, memory-mapped table written by write_table().
+    Answers the same questions as dot_3x3_solver.Solver
+    """
+    __slots__ = ('rows', 'cols', '_map', '_records', '_keys', '_symmetry')
+
+    def __init__(self, path):
+        with open(path, 'rb') as table_file:
+            self._map = mmap.mmap(table_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, rows, cols, lines, count = \
+                    _HEADER.unpack_from(self._map)
+        except struct.error:
+            self._map.close()
+            raise ValueError('{0} is not a table file'.format(path))
+
+        key_size = 4 * count if version == CANONICAL_VERSION else 0
+
+        if magic != MAGIC or version not in (VERSION, CANONICAL_VERSION) or \
+                (version == VERSION and count != 1 << lines) or \
+                len(self._map) != _HEADER.size + key_size + 2 * count:
+            self._map.close()
+            raise ValueError('{0} is not a table file'.format(path))
+
+        self.rows = rows
+        self.cols = cols
+        body = memoryview(self._map)[_HEADER.size:]
+        self._records = body[key_size:].cast('b')
+
+        if key_size:
+            self._keys = body[:key_size].cast('I')
+            self._symmetry = symmetry(rows, cols)
+        else:
+            self._keys = self._symmetry = None
+
+        body.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file. The table cannot be used afterwards
+        """
+        self._records.release()
+        if self._keys is not None:
+            self._keys.release()
+        self._map.close()
+
+    def _record(self, lines):
+        """(int) -> tuple
+        Returns (record index, transform) of position <lines>; the transform
+        maps the position to the one the record describes
+        """
+        if self._keys is None:
+            return lines, 0
+
+        key, transform = self._symmetry.canonical(lines)
+        return bisect.bisect_left(self._keys, key), transform
+
+    def value(self, lines):
+        """(int) -> int
+        Returns the margin the player to move gets from the open squares of
+        position <lines> under perfect play by both sides
+        """
+        return self._records[2 * self._record(lines)[0]]
+
+    def best_line(self, lines):
+        """(int) -> int or NoneType
+        Returns the number of a best line to add in position <lines>, or
+        None if the board is full
+        """
+        index, transform = self._record(lines)
+        move = self._records[2 * index + 1]
+
+        if move < 0:
+            return None
+
+        if transform:
+            return self._symmetry.restore_line(move, transform)
+
+        return move
+
+
+def load(path):
+    """(str) -> Table
+    Maps the 3x3 table in the file <path> and makes dot_3x3_solver answer
+    from it instead of solving the game.
+    Returns the table
+    """
+    table = Table(path)
+
+    if table.rows != 3 or table.cols != 3:
+        table.close()
+        raise ValueError('{0} does not hold the 3x3 board'.format(path))
+
+    set_solver(table)
+    return table
+
+
+if __name__ == '__main__':
+    arguments = [argument for argument in sys.argv[1:]
+                 if argument != '--canonical']
+
+    if len(arguments) not in (1, 3):
+        print(__doc__.rsplit('Usage:', 1)[1].strip())
+        sys.exit(2)
+
+    if len(arguments) == 3:
+        board_rows, board_cols = int(arguments[1]), int(arguments[2])
+    else:
+        board_rows, board_cols = 3, 3
+
+    positions = write_table(arguments[0], board_rows, board_cols,
+                            '--canonical' in sys.argv)
+    print('Wrote {0} positions to {1}'.format(positions, arguments[0]))
@@ -1,13 +1,44 @@
 #!/usr/bin/env python3
 """
 Game board interface using text-output and keyboard-only-input
+
+Usage:
+    python3 dot_3x3_textmode.py [X|Y] [--record FILE]
+
+Naming a player lets the computer play for that player. With --record, the
+game is appended to the game record stream FILE (see dot_record).
 """
+import argparse
+import sys
+
 from dot_3x3_logic import initialize_board
 from dot_3x3_logic import add_line
-from dot_3x3_logic import square_owner
-from dot_3x3_logic import check_line
-from dot_3x3_logic import winner
 from dot_3x3_logic import current_player
+from dot_3x3_logic import default_game
+from dot_3x3_logic import LINE_NAMES
+from dot_3x3_logic import SQUARE_NAMES
+from dot_3x3_logic import subscribe
+from dot_3x3_logic import LineAdded
+from dot_3x3_logic import GameOver
+from dot_nxm_logic import line_dots
+from dot_ai import AlphaBetaPlayer
+from dot_record import RecordWriter
+
+# Line named by each move, both ways round: '01' and '10' -> 'North_Northwest'
+_MOVE_LINES = {}
+for _line, _name in enumerate(LINE_NAMES):
+    _dot1, _dot2 = line_dots(3, 3, _line)
+    _MOVE_LINES['{0}{1}'.format(_dot1, _dot2)] = _name
+    _MOVE_LINES['{1}{0}'.format(_dot1, _dot2)] = _name
+del _line, _name, _dot1, _dot2
+
+# Bit of each line in GameState.lines
+_LINE_BITS = {name: 1 << i for i, name in enumerate(LINE_NAMES)}
+
+# Frames drawn by render_board(), by (lines, owners); emptied when it
+# reaches _FRAME_CACHE entries
+_frames = {}
+_FRAME_CACHE = 1 << 14
 
 def show_player(player):
     """(str) -> str
@@ -19,105 +50,63 @@ def show_player(player):
     else:
         return ''
 
-def draw_game():
-# TODO: Fix alignment
-    """(None) -> str
-    Draws the connect the dot game using text graphics
+def render_board(lines, owners):
+    """(int, int) -> str
+    Returns the text drawing of the board with the lines <lines> and the
+    square owners <owners> (see GameState.lines and GameState.owners).
+    Frames are memoised by board state, so redrawing a position already
+    drawn costs a dictionary lookup
     """
-    # 0---1---2   ----------------------------------
-    print('   0', end='')
-    if check_line('North_Northwest'):
-        print('---', end='')
-    
-    else:
-        print('   ', end='')
+    frame = _frames.get((lines, owners))
 
-    print('1', end='')
-    if check_line('North_Northeast'):
-        print('---', end='')
-    
-    else:
-        print('   ', end='')
-
-    print('2')
-
-    # |   |   |   ----------------------------------
-    
-    if check_line('West_Northwest'):
-        print('   |', end='')
-    else:
-        print('    ', end='')
-    
-    print(show_player(square_owner('top_left')), end='')
+    if frame is None:
+        if len(_frames) >= _FRAME_CACHE:
+            _frames.clear()
 
-    if check_line('North_Center'):
-        print('  |', end='')
-    else:
-        print('   ', end='')
-    
-    print(show_player(square_owner('top_right')), end='')
+        def line(name, drawn, missing):
+            return drawn if lines & _LINE_BITS[name] else missing
 
-    if check_line('East_Northeast'):
-        print('  |')
-    else:
-        print('   ')
+        def owner(sq):
+            index = SQUARE_NAMES.index(sq)
+            if owners >> index & 1:
+                return show_player('X')
+            elif owners >> (index + 4) & 1:
+                return show_player('Y')
+            return show_player(None)
 
-    # 3---4---5   ----------------------------------
+        frame = _frames[lines, owners] = ''.join((
+            '   0', line('North_Northwest', '---', '   '),
+            '1', line('North_Northeast', '---', '   '), '2\n',
 
-    print('   3', end='')
-    if check_line('West_Center'):
-        print('---', end='')
-    
-    else:
-        print('   ', end='')
+            line('West_Northwest', '   |', '    '), owner('top_left'),
+            line('North_Center', '  |', '   '), owner('top_right'),
+            line('East_Northeast', '  |', '   '), '\n',
 
-    print('4', end='')
-    if check_line('East_Center'):
-        print('---', end='')
-    
-    else:
-        print('   ', end='')
+            '   3', line('West_Center', '---', '   '),
+            '4', line('East_Center', '---', '   '), '5\n',
 
-    print('5')
+            line('West_Southwest', '   |', '   '), owner('bottom_left'),
+            line('South_Center', '  |', '   '), owner('bottom_right'),
+            line('East_Southeast', '  |', '   '), '\n',
 
-    # |   |   |   ----------------------------------
+            '   6', line('South_Southwest', '---', '   '),
+            '7', line('South_Southeast', '---', '   '), '8\n'))
 
-    if check_line('West_Southwest'):
-        print('   |', end='')
-    else:
-        print('   ', end='')
-    
-    print(show_player(square_owner('bottom_left')), end='')
+    return frame
 
-    if check_line('South_Center'):
-        print('  |', end='')
-    else:
-        print('   ', end='')
-    
-    print(show_player(square_owner('bottom_right')), end='')
-
-    if check_line('East_Southeast'):
-        print('  |')
-    else:
-        print('   ')
-
-    # 6---7---8   ----------------------------------
-
-    print('   6', end='')
-    if check_line('South_Southwest'):
-        print('---', end='')
-    
-    else:
-        print('   ', end='')
-
-    print('7', end='')
-    if check_line('South_Southeast'):
-        print('---', end='')
-    
-    else:
-        print('   ', end='')
+def draw_game(game=None, out=None):
+# TODO: Fix alignment
+    """(GameState, file) -> str
+    Draws the connect the dot game <game> using text graphics, writing to
+    the text file <out> in a single write.
+    Draws the game played by the dot_3x3_logic functions if <game> is None,
+    and writes to the screen if <out> is None
+    """
+    if game is None:
+        game = default_game()
 
-    print('8')
+    (sys.stdout if out is None else out).write(
+        render_board(game.lines, game.owners))
 
 def make_line(move):
     """(str) -> str
@@ -133,55 +122,157 @@ def make_line(move):
     of 'North_Northwest', 'Center_North' etc. If the dot1, dot2 pair 
     represents an invalid combination e.g (0, 4), returns string 'No line'
     """
-    if move == '01' or move == '10':
-        return 'North_Northwest'
+    return _MOVE_LINES.get(move, 'No line')
 
-    elif move == '21' or move == '12':
-        return 'North_Northeast'
+def computer_move(computer):
+    """(AlphaBetaPlayer) -> str
+    Determines the move, a pair of dots such as '01', that the <computer>
+    player makes in the current game
+    """
+    dot1, dot2 = line_dots(3, 3, computer.choose_move(default_game().lines))
+    return '{0}{1}'.format(dot1, dot2)
 
-    elif move == '03' or move == '30':
-        return 'West_Northwest'
 
-    elif move == '14' or move == '41':
-        return 'North_Center'
+class BoardRenderer:
+    """Draws boards of <rows> x <cols> dots (see dot_nxm_logic.Board) on an
+    ANSI terminal, with its top left corner at row <top> and column <left>
+    of the screen (counting from 1).
 
-    elif move == '25' or move == '52':
-        return 'East_Northeast'
+    The first frame draws the whole board; every later frame only moves the
+    cursor to the lines and squares that changed since the frame before and
+    redraws those, so a move costs a few bytes whatever the board size.
+    Dots are drawn as '@', lines as '---' and '|', and owned squares as the
+    owner's letter.
+    """
 
-    elif move == '34' or move == '43':
-        return 'West_Center'
+    def __init__(self, rows, cols, top=1, left=1):
+        self.rows = rows
+        self.cols = cols
+        self.top = top
+        self.left = left
+        self._lines = None      # State drawn by the last frame
+        self._owners = None
+        self._horizontal = rows * (cols - 1)
+
+    def _at(self, row, col, text):
+        """(int, int, str) -> str
+        Returns <text> placed at character <row>, <col> of the board
+        """
+        return '\x1b[{0};{1}H{2}'.format(self.top + row, self.left + col,
+                                         text)
+
+    def _line(self, line, drawn):
+        """(int, bool) -> str
+        Returns the drawing of <line>, or blanks where it is if not <drawn>
+        """
+        if line < self._horizontal:
+            row, col = divmod(line, self.cols - 1)
+            return self._at(2 * row, 4 * col + 1, '---' if drawn else '   ')
+
+        row, col = divmod(line - self._horizontal, self.cols)
+        return self._at(2 * row + 1, 4 * col, '|' if drawn else ' ')
+
+    def _square(self, sq, owner):
+        """(int, int) -> str
+        Returns the drawing of the owner (0 none, 1 X, 2 Y) of square <sq>
+        """
+        row, col = divmod(sq, self.cols - 1)
+        return self._at(2 * row + 1, 4 * col + 2, ' XY'[owner])
+
+    def frame(self, board):
+        """(Board) -> str
+        Returns the terminal output that brings the screen from the last
+        frame to <board>: the whole board the first time, otherwise only
+        the changes
+        """
+        lines, owners = board.lines, bytes(board.owners)
+        parts = []
+
+        if self._lines is None:
+            # Clear the area and draw the dots
+            row_text = '@' + '   @' * (self.cols - 1)
+            blank = ' ' * len(row_text)
+            for row in range(2 * self.rows - 1):
+                parts.append(self._at(row, 0,
+                                      row_text if row % 2 == 0 else blank))
+            changed_lines, previous = lines, bytes(len(owners))
+        else:
+            changed_lines, previous = lines ^ self._lines, self._owners
 
-    elif move == '45' or move == '54':
-        return 'East_Center'
+        while changed_lines:
+            low = changed_lines & -changed_lines
+            line = low.bit_length() - 1
+            parts.append(self._line(line, lines & low))
+            changed_lines ^= low
 
-    elif move == '36' or move == '63':
-        return 'West_Southwest'
+        if owners != previous:
+            for sq, owner in enumerate(owners):
+                if owner != previous[sq]:
+                    parts.append(self._square(sq, owner))
 
-    elif move == '47' or move == '74':
-        return 'South_Center'
+        # Leave the cursor below the board
+        parts.append(self._at(2 * self.rows - 1, 0, ''))
 
-    elif move == '58' or move == '85':
-        return 'East_Southeast'
+        self._lines, self._owners = lines, owners
+        return ''.join(parts)
 
-    elif move == '67' or move == '76':
-        return 'South_Southwest'
+    def draw(self, board, out=None):
+        """(Board, file) -> NoneType
+        Writes the frame for <board> to the text file <out>, by default the
+        screen, in a single write
+        """
+        out = sys.stdout if out is None else out
+        out.write(self.frame(board))
+        out.flush()
 
-    elif move == '78' or move == '87':
-        return 'South_Southeast'
+    def reset(self):
+        """
+        Forgets the screen contents, so the next frame draws everything
+        """
+        self._lines = self._owners = None
 
-    else:
-        return 'No line' # Default 
 
 # TODO: Fix declaration of winner
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Connect the dots (3x3)')
+    parser.add_argument('computer', nargs='?', type=str.upper,
+                        choices=('X', 'Y'),
+                        help='player the computer plays for')
+    parser.add_argument('--record', metavar='FILE',
+                        help='append the game to this record stream')
+    arguments = parser.parse_args()
+
+    # The computer plays for the player named on the command line, if any
+    computer_player = arguments.computer
+    computer = AlphaBetaPlayer() if computer_player else None
+
+    moves = []  # Lines added, in order, for the game record
+    result = [] # The winner, once the game is over
+
+    def game_event(event):
+        """(tuple) -> NoneType
+        Keeps the lines added and the winner from the events of the game
+        """
+        if isinstance(event, LineAdded):
+            moves.append(LINE_NAMES.index(event.line))
+
+        elif isinstance(event, GameOver):
+            result.append(event.winner)
+
     # Start a new game
     initialize_board()
+    subscribe(game_event)
     draw_game()
     winning_player = None   # No winner at start
     
     while not winning_player:
         prompt = 'Move for player {0} : '.format(current_player())
-        move = input(prompt)    # Get the dots to connect
+
+        if current_player() == computer_player:
+            move = computer_move(computer)
+            print(prompt + move)
+        else:
+            move = input(prompt)    # Get the dots to connect
         
         if move == 'Q' or move == 'q' : # 'Q' quits the program
             break
@@ -196,7 +287,8 @@ if __name__ == '__main__':
         else:
             print('Connection not possible')
         
-        winning_player = winner() # Check for win
+        if result: # Check for win
+            winning_player = result[0]
 
     # Determine winner, either player X or player Y
     if winning_player == 'X':
@@ -208,4 +300,8 @@ if __name__ == '__main__':
     else:
         print('Draw')
     
-    print('\n**** GAME OVER ****')
\ No newline at end of file
+    print('\n**** GAME OVER ****')
+
+    if arguments.record:
+        with open(arguments.record, 'ab') as record_file:
+            RecordWriter(record_file).write_game(moves)
\ No newline at end of file
@@ -1,5 +1,21 @@
 #!/usr/bin/env python3
-"""Graphical Presentation for game board using Python's turtle"""
+"""Graphical Presentation for game board using Python's turtle
+
+Usage:
+    python3 dot_3x3_turtle.py [X|Y|XY]
+
+Naming a player lets the computer play for that player; naming both lets
+the computer play itself. A line is added by clicking its two dots in turn,
+or by clicking the line itself.
+
+Drawing is queued: the events of the game (see dot_3x3_logic) mark the
+lines and squares that change as dirty, and a frame scheduled with ontimer()
+draws everything dirty at once and updates the window a single time. Press
+'s' to print the frame statistics.
+"""
+import sys
+from time import perf_counter
+
 # Turtle functions
 from turtle import pensize
 from turtle import penup
@@ -20,6 +36,7 @@ from turtle import listen
 from turtle import title
 from turtle import mainloop
 from turtle import clearscreen
+from turtle import ontimer
 
 # Alerts and Messages
 from tkinter import messagebox
@@ -27,31 +44,59 @@ from tkinter import messagebox
 # Game engine functions
 from dot_3x3_logic import initialize_board
 from dot_3x3_logic import add_line
-from dot_3x3_logic import square_owner
-from dot_3x3_logic import check_line
 from dot_3x3_logic import winner
 from dot_3x3_logic import current_player
+from dot_3x3_logic import default_game
+from dot_3x3_logic import LINE_NAMES
+from dot_3x3_logic import SQUARE_NAMES
+from dot_3x3_logic import subscribe
+from dot_3x3_logic import LineAdded
+from dot_3x3_logic import SquareCaptured
+from dot_3x3_logic import TurnChanged
+from dot_3x3_logic import GameOver
+
+# Board coordinates
+from dot_geometry import geometry
+from dot_nxm_logic import line_dots as nxm_line_dots
+
+# Computer player
+from dot_ai import AlphaBetaPlayer
 
 # Init global vars supporting graphical interace
 initial_dot = None  # First dot selected by a player when creating a line
 dot_radius = 10     # Adjustable for larger/smaller dots
+computer_players = ''   # Players ('X', 'Y' or 'XY') the computer plays for
+computer = None         # The computer player
+
+# Rendering state: what the next frame must draw
+FRAME_MS = 16       # Delay between a change and the frame that draws it
+MOVE_MS = 50        # Delay between two moves of the computer
+dirty_dots = {}     # Dot -> color to draw it in
+dirty_lines = []    # (dot1, dot2) of each line to draw
+dirty_squares = {}  # Square -> owner to draw
+frame_pending = False   # True while a frame is scheduled
+
+# Frame statistics: frames drawn, operations drawn, and the time frames took
+frame_stats = {'frames': 0, 'operations': 0, 'last_ms': 0.0, 'max_ms': 0.0,
+               'total_ms': 0.0}
+
+# Dots by number, as in dot_nxm_logic: row by row from the top left
+DOT_NAMES = ('Northwest', 'North', 'Northeast',
+             'West', 'Center', 'East',
+             'Southwest', 'South', 'Southeast')
+_DOT_INDEX = {name: i for i, name in enumerate(DOT_NAMES)}
+_SQUARE_INDEX = {name: i for i, name in enumerate(SQUARE_NAMES)}
+_LINE_INDEX = {name: i for i, name in enumerate(LINE_NAMES)}
+
+# Coordinates of the dots, lines and squares in the window
+board = geometry(3, 3)
 
 def square_to_point(sq):
     """(str) -> tuple
     Compute the (x, y) coordinates of the center of a square.
     Used to properly place the square's owner when it's captured.
     """
-    if sq == 'top_left':
-        return (200, 400)
-    
-    elif sq == 'top_right':
-        return (400, 400)
-    
-    elif sq == 'bottom_left':
-        return (200, 200)
-    
-    elif sq == 'bottom_right':
-        return (400, 200)
+    return board.square_points[_SQUARE_INDEX[sq]]
 
 def hit(x_pos, y_pos):
     """(int, int) -> str or None
@@ -60,73 +105,44 @@ def hit(x_pos, y_pos):
     Used when a player clicks the mouse over the board to determine which dot
     (if any) was selected.
     """
-    dot = None  # Default result
-
-    if 90 < x_pos < 110 and 490 < y_pos < 510:
-        dot = 'Northwest'
-        
-    elif 290 < x_pos < 310 and 490 < y_pos < 510:
-        dot = 'North'
-    
-    elif 490 < x_pos < 510 and 490 < y_pos < 510:
-        dot = 'Northeast'
+    dot = board.dot_at(x_pos, y_pos)
 
-    elif 90 < x_pos < 110 and 290 < y_pos < 310:
-        dot = 'West'
-    
-    elif 290 < x_pos < 310 and 290 < y_pos < 310:
-        dot = 'Center'
+    if dot is None:
+        return None
 
-    elif 490 < x_pos < 510 and 290 < y_pos < 310:
-        dot = 'East'
+    return DOT_NAMES[dot]
 
-    elif 90 < x_pos < 110 and 90 < y_pos < 110:
-        dot = 'Southwest'
+def hit_line(x_pos, y_pos):
+    """(int, int) -> str or None
+    Returns the line (if any) that the point (x_pos, y_pos) is close to.
+    Lets a player add a line with a single click on it.
+    """
+    line = board.line_at(x_pos, y_pos)
 
-    elif 290 < x_pos < 310 and 90 < y_pos < 110 :
-        dot = 'South'
-    
-    elif 490 < x_pos < 510 and 90 < y_pos < 110:
-        dot = 'Southeast'
+    if line is None:
+        return None
 
-    return dot
+    return LINE_NAMES[line]
 
 def dot_to_point(dot):
     """ (str) -> tuple
     Maps a <dot> to it's location on the board. used to render a dot in it's 
     proper place. 
     """
-    if dot == 'Northwest':
-        return 100, 500
-    
-    elif dot == 'North':
-        return 300, 500
-    
-    elif dot == 'Northeast':
-        return 500, 500
+    return board.dot_points[_DOT_INDEX[dot]]
 
-    elif dot == 'West':
-        return 100, 300
-
-    elif dot == 'Center':
-        return 300, 300
-
-    elif dot == 'East':
-        return 500, 300
-
-    elif dot == 'Southwest':
-        return 100, 100
-
-    elif dot == 'South':
-        return 300, 100
-
-    elif dot == 'Southeast':
-        return 500, 100
+def line_dots(line):
+    """(str) -> tuple
+    Returns the names of the two dots <line> connects
+    """
+    dot1, dot2 = nxm_line_dots(3, 3, _LINE_INDEX[line])
+    return DOT_NAMES[dot1], DOT_NAMES[dot2]
 
 def draw_dot(name, dot_color='black'):
     """(tuple) -> turtle
     Draws a graphical dot <name> within the graphical window.
     <col> specifies the dots's color (black by default)
+    The window shows it at the next update()
     """
     global dot_radius
 
@@ -139,17 +155,16 @@ def draw_dot(name, dot_color='black'):
     begin_fill()
     circle(dot_radius)
     end_fill()
-    update()
 
 def draw_line(x_pos1, y_pos1, x_pos2, y_pos2):
     """(int, int, int, int) -> turtle
     Draws a line segment with endpints (x_pos1, y_pos1) and (x_pos2, y_pos2)
+    The window shows it at the next update()
     """
     penup()
     setposition(x_pos1, y_pos1)
     pendown()
     setposition(x_pos2, y_pos2)
-    update()
 
 def draw_X(x_pos, y_pos):
     """(int, int) -> turtle
@@ -184,30 +199,125 @@ def draw_square(sq, owner):
         draw_Y(x_pos, y_pos)
     # Else do not draw anything - the square ha no owner
 
-def check_squares():
-    """(None) -> str
-    Checks all squares to determine if any are complete.
-    Draws the square owner's mark in a completed square.
-    If all squares are owned, the function declares a winner or announces 
-    a draw. 
+##############################################################################
+# NOTE: Queued drawing. Changes are queued here and drawn by draw_frame()
+#-----------------------------------------------------------------------------
+
+def request_frame():
+    """
+    Schedules a frame to draw the queued changes, unless one is scheduled
     """
-    draw_square('top_left', square_owner('top_left'))
-    draw_square('top_right', square_owner('top_right'))
-    draw_square('bottom_left', square_owner('bottom_left'))
-    draw_square('bottom_right', square_owner('bottom_right'))
+    global frame_pending
 
-    # Check the ownership of each potential square
-    win = winner()
+    if not frame_pending:
+        frame_pending = True
+        ontimer(draw_frame, FRAME_MS)
 
-    if win == 'X':
-        messagebox.showinfo('Game Over', 'X wins')
-    
-    elif win == 'Y':
-        messagebox.showinfo('Game Over', 'Y wins')
-    
-    elif win == 'Draw':
-        messagebox.showinfo('Game Over', 'Tied Game')
-        
+def queue_dot(dot, dot_color='black'):
+    """(str, str) -> NoneType
+    Queues the dot <dot> to be drawn in <dot_color>
+    """
+    dirty_dots[dot] = dot_color
+    request_frame()
+
+def queue_line(dot1, dot2):
+    """(str, str) -> NoneType
+    Queues the line between <dot1> and <dot2> to be drawn
+    """
+    dirty_lines.append((dot1, dot2))
+    request_frame()
+
+def queued_operations():
+    """() -> int
+    Returns the number of drawing operations waiting for the next frame
+    """
+    return len(dirty_dots) + len(dirty_lines) + len(dirty_squares)
+
+def draw_frame():
+    """
+    Draws everything queued and updates the window once
+    """
+    global frame_pending
+
+    frame_pending = False
+    operations = queued_operations()
+
+    if not operations:
+        return
+
+    start = perf_counter()
+
+    # Lines first, so the dots at their ends are drawn over them
+    if dirty_lines:
+        color('black')
+        pensize(5)
+        for dot1, dot2 in dirty_lines:
+            x_pos1, y_pos1 = dot_to_point(dot1)
+            x_pos2, y_pos2 = dot_to_point(dot2)
+            draw_line(x_pos1, y_pos1, x_pos2, y_pos2)
+            dirty_dots.setdefault(dot1, 'black')
+            dirty_dots.setdefault(dot2, 'black')
+
+    for sq, owner in dirty_squares.items():
+        draw_square(sq, owner)
+
+    for dot, dot_color in dirty_dots.items():
+        draw_dot(dot, dot_color)
+
+    dirty_lines.clear()
+    dirty_squares.clear()
+    dirty_dots.clear()
+    update()
+
+    elapsed = (perf_counter() - start) * 1000
+    frame_stats['frames'] += 1
+    frame_stats['operations'] += operations
+    frame_stats['last_ms'] = elapsed
+    frame_stats['max_ms'] = max(frame_stats['max_ms'], elapsed)
+    frame_stats['total_ms'] += elapsed
+
+def print_stats():
+    """
+    Prints the frame statistics
+    """
+    frames = frame_stats['frames']
+    print('{0} frames, {1} operations, {2} queued, last {3:.1f} ms, '
+          'average {4:.1f} ms, max {5:.1f} ms'.format(
+              frames, frame_stats['operations'], queued_operations(),
+              frame_stats['last_ms'],
+              frame_stats['total_ms'] / frames if frames else 0.0,
+              frame_stats['max_ms']))
+
+def game_event(event):
+    """(tuple) -> turtle or messagebox
+    Responds to an event of the game (see dot_3x3_logic): queues the drawing
+    of an added line or a captured square, shows the player to move in the
+    title bar, and announces the result when the game is over
+    """
+    if isinstance(event, LineAdded):
+        queue_line(*line_dots(event.line))
+
+    elif isinstance(event, SquareCaptured):
+        dirty_squares[event.square] = event.player
+        request_frame()
+
+    elif isinstance(event, TurnChanged):
+        # Adjust title bar to show current player
+        title('3x3 Connect the dots - Current player: {0}'.format(
+            event.player))
+
+    elif isinstance(event, GameOver):
+        # Show the final position before the message box blocks the window
+        draw_frame()
+
+        if event.winner == 'X':
+            messagebox.showinfo('Game Over', 'X wins')
+
+        elif event.winner == 'Y':
+            messagebox.showinfo('Game Over', 'Y wins')
+
+        else:
+            messagebox.showinfo('Game Over', 'Tied Game')
 
 def mouse_click(x_pos, y_pos):
     """(int, int) -> turtle or messagebox
@@ -220,6 +330,9 @@ def mouse_click(x_pos, y_pos):
     """
     global initial_dot
 
+    if current_player() in computer_players:
+        return  # The computer is moving
+
     print('Initial dot = {0}'.format(initial_dot))
 
     print('Clicked at x = {0} and y = {1}'.format(x_pos, y_pos))
@@ -230,40 +343,58 @@ def mouse_click(x_pos, y_pos):
 
         if not initial_dot:
             initial_dot = dot
-            draw_dot(initial_dot, 'red')
+            queue_dot(initial_dot, 'red')
         
         elif dot != initial_dot:
             
-            if add_line(line_name(initial_dot, dot)):
-                # Draw the added line
-                color('black')
-                pensize(5)
-                x_pos1, y_pos1 = dot_to_point(initial_dot)
-                x_pos2, y_pos2 = dot_to_point(dot)
-
-                draw_line(x_pos1, y_pos1, x_pos2, y_pos2)
-
-                # Adjust title bar to show current player
-                title('3x3 Connect the dots - Current player: {0}'.format(current_player()))
-                
-                # Check to see if the move captured a square and/or ended the game
-                check_squares()
+            played = play_line(initial_dot, dot)
             
             # Clear the initial dot and redraw both connecting dots
-            draw_dot(initial_dot)
+            queue_dot(initial_dot)
             initial_dot = None # Initial dot no longer in play
-            draw_dot(dot)
+            queue_dot(dot)
+
+            if played:
+                ontimer(computer_moves, MOVE_MS)
+
+    elif initial_dot:
+        queue_dot(initial_dot)
+        initial_dot = None
 
     else:
-        if initial_dot:
-            draw_dot(initial_dot)
-            initial_dot = None     
+        # A click on a line adds it
+        line = hit_line(x_pos, y_pos)
+        if line and play_line(*line_dots(line)):
+            ontimer(computer_moves, MOVE_MS)
+
+def play_line(dot1, dot2):
+    """(str, str) -> bool
+    Adds the line connecting the dots <dot1> and <dot2> to the game, if
+    possible; game_event() draws what it changes.
+    Returns True if the line was added, otherwise False
+    """
+    return add_line(line_name(dot1, dot2))
+
+def computer_moves():
+    """(None) -> turtle
+    Lets the computer add a line if it is the computer's turn and the game
+    is not over, and schedules its next move, so the window is redrawn
+    between moves
+    """
+    if computer and current_player() in computer_players and not winner():
+        line = LINE_NAMES[computer.choose_move(default_game().lines)]
+        dot1, dot2 = line_dots(line)
+        play_line(dot1, dot2)
+        ontimer(computer_moves, MOVE_MS)
 
 def reset_game():
     """
     Reinitialize the game's state for the start of a new game
     """
     clearscreen()
+    dirty_dots.clear()
+    dirty_lines.clear()
+    dirty_squares.clear()
     initialize()
 
 def line_name(dot1, dot2):
@@ -273,67 +404,24 @@ def line_name(dot1, dot2):
     Displays an error message box if the two dots do not participate in a 
     valid line. 
     """
-    if (dot1 == 'Northwest' and dot2 == 'North') or \
-            (dot1 == 'North' and dot2 == 'Northwest'):
-        return 'North_Northwest'
-
-    elif (dot1 == 'Northeast' and dot2 == 'North') or \
-            (dot1 == 'North' and dot2 == 'Northeast'):
-        return 'North_Northeast'
-
-    elif (dot1 == 'Northwest' and dot2 == 'West') or \
-            (dot1 == 'West' and dot2 == 'Northwest'):
-        return 'West_Northwest'
-
-    elif (dot1 == 'North' and dot2 == 'Center') or \
-            (dot1 == 'Center' and dot2 == 'North'):
-        return 'North_Center'
-
-    elif (dot1 == 'Northeast' and dot2 == 'East') or \
-            (dot1 == 'East' and dot2 == 'Northeast'):
-        return 'East_Northeast'
-
-    elif (dot1 == 'West' and dot2 == 'Center') or \
-            (dot1 == 'Center' and dot2 == 'West'):
-        return 'West_Center'
-
-    elif (dot1 == 'East' and dot2 == 'Center') or \
-            (dot1 == 'Center' and dot2 == 'East'):
-        return 'East_Center'
-
-    elif (dot1 == 'West' and dot2 == 'Southwest') or \
-            (dot1 == 'Southwest' and dot2 == 'West'):
-        return 'West_Southwest'
-
-    elif (dot1 == 'South' and dot2 == 'Center') or \
-            (dot1 == 'Center' and dot2 == 'South'):
-        return 'South_Center'
-   
-    elif (dot1 == 'East' and dot2 == 'Southeast') or \
-            (dot1 == 'Southeast' and dot2 == 'East'):
-        return 'East_Southeast'
-
-    elif (dot1 == 'South' and dot2 == 'Southwest') or \
-            (dot1 == 'Southwest' and dot2 == 'South'):
-        return 'South_Southwest'
-
-    elif (dot1 == 'South' and dot2 == 'Southeast') or \
-            (dot1 == 'Southeast' and dot2 == 'South'):
-        return 'South_Southeast'
+    line = board.dots_line(_DOT_INDEX[dot1], _DOT_INDEX[dot2])
 
-    else:
+    if line is None:
         print('Not a VALID dot link')
         messagebox.showerror('Invalid Link', 'Can\'t connect those two dots')
         return None
 
+    return LINE_NAMES[line]
+
 def initialize():
     """(None) -> turtle
     Initializes the graphical presentation and game engine
     """
     # Global dot objects
 
-    # Init game engine
+    # Init game engine, and draw what changes as it happens
     initialize_board()
+    subscribe(game_event)
 
     screensize(600, 600) # Specify the dimensions of the window
     setworldcoordinates(0, 0, 599, 599) # Move origin (0, 0) to the left bottom of the window
@@ -345,6 +433,7 @@ def initialize():
     # Register callback functions with the Turtle graphics framework
     onscreenclick(mouse_click) # On mouse-click
     onkeyrelease(reset_game, 'q') # On pressing <key> Q
+    onkeyrelease(print_stats, 's') # On pressing <key> S
 
     listen()    # Permit window to listen to keypress events
     
@@ -357,10 +446,17 @@ def initialize():
     for dot in ('North', 'Northeast', 'Northwest',\
                 'South', 'Southeast', 'Southwest',\
                 'Center', 'East', 'West'):
-        draw_dot(dot)
+        queue_dot(dot)
 
-    update() # Compel window to show drawing
+    draw_frame() # Compel window to show drawing
+
+    computer_moves() # The computer may have the first move
 
 if __name__ == '__main__':
+    # The computer plays for the player named on the command line, if any
+    if len(sys.argv) > 1 and sys.argv[1].upper() in ('X', 'Y', 'XY'):
+        computer_players = sys.argv[1].upper()
+        computer = AlphaBetaPlayer()
+
     initialize()    # Set up the game
     mainloop()      # Start game running
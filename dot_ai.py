@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Computer player using alpha-beta search
+
+Searches the game tree of any board size from a position given as the
+bitboard of its lines (see dot_nxm_logic for the line numbering). Values
+are the margin of squares, own minus opponent's, that the player to move
+gets from the squares still open.
+
+The search deepens one move at a time until its time budget runs out and
+plays the best move of the deepest search it completed, so a move never
+takes much longer than the budget however large the board. Moves are tried
+in the order:
+    1. the best move found for the position by an earlier search,
+    2. lines that complete a square,
+    3. lines that leave no square with three sides for the opponent,
+    4. everything else.
+Once no safe line is left and the open squares form chains and loops, the
+position is solved outright by dot_endgame instead of searched.
+
+Positions are remembered in a transposition table of fixed size. When two
+positions compete for a slot, the one searched deeper or more recently
+keeps it. The table can be keyed by the canonical form of a position (see
+dot_symmetry), so the rotations and mirror images of a position share one
+entry; its best move is stored for the canonical form and mapped back.
+"""
+from time import perf_counter
+
+from dot_endgame import analyzer
+from dot_nxm_logic import bordering_masks
+from dot_nxm_logic import iter_lines
+from dot_nxm_logic import line_count
+from dot_nxm_logic import move_kinds
+from dot_symmetry import symmetry
+
+# Bound types stored in the transposition table
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+# Multiplier for spreading positions over the transposition table
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+# Largest board (in lines) whose table is keyed by canonical positions
+# unless asked otherwise; beyond it canonicalising costs more than a search
+# node saves
+SYMMETRIC_LINES = 40
+
+
+class _Timeout(Exception):
+    """Raised inside the search when the time budget is spent"""
+
+
+class AlphaBetaPlayer:
+    """Alpha-beta player for a board of <rows> x <cols> dots.
+
+    <time_limit> is the time budget of a move in seconds, and <table_bits>
+    sets the size of the transposition table to 2 ** table_bits entries.
+    <symmetric> keys the table by canonical positions; by default it does
+    so on boards of at most SYMMETRIC_LINES lines.
+    After each move, <depth> holds the depth of the deepest completed search
+    and <nodes> the number of positions visited.
+    """
+    __slots__ = ('rows', 'cols', 'time_limit', 'depth', 'nodes', '_full',
+                 '_bordering', '_table', '_shift', '_generation',
+                 '_deadline', '_symmetry', '_endgame')
+
+    def __init__(self, rows=3, cols=3, time_limit=0.05, table_bits=16,
+                 symmetric=None):
+        self.rows = rows
+        self.cols = cols
+        self.time_limit = time_limit
+        self.depth = 0
+        self.nodes = 0
+
+        lines = line_count(rows, cols)
+        self._full = (1 << lines) - 1
+
+        # Squares (as line masks) bordering each line
+        self._bordering = bordering_masks(rows, cols)
+
+        self._table = [None] * (1 << table_bits)
+        self._shift = 64 - table_bits
+        self._generation = 0
+        self._deadline = 0.0
+
+        if symmetric is None:
+            symmetric = lines <= SYMMETRIC_LINES
+        self._symmetry = symmetry(rows, cols) if symmetric else None
+        self._endgame = analyzer(rows, cols)
+
+    def choose_move(self, lines):
+        """(int) -> int or NoneType
+        Returns the line to add in position <lines>, or None if the board is
+        full
+        """
+        free = self._full & ~lines
+
+        if not free:
+            return None
+
+        self._deadline = perf_counter() + self.time_limit
+        self._generation = (self._generation + 1) & 0xFF
+        self.nodes = 0
+        self.depth = 0
+        remaining = bin(free).count('1')
+
+        endgame = self._endgame.analyze(lines)
+        if endgame is not None:
+            self.depth = remaining
+            return endgame.move
+
+        best = self._ordered(lines, free, -1)[0]
+
+        for depth in range(1, remaining + 1):
+            try:
+                self._search(lines, depth, -remaining - 1, remaining + 1)
+            except _Timeout:
+                break
+
+            key, transform = self._canonical(lines)
+            entry = self._probe(key)
+            if entry is not None:
+                best = entry[4]
+                if transform:
+                    best = self._symmetry.restore_line(best, transform)
+            self.depth = depth
+
+        return best
+
+    def _canonical(self, lines):
+        """(int) -> tuple
+        Returns (table key, transform) of position <lines>: its canonical
+        form and the transform reaching it, or the position itself and 0 if
+        the table is not keyed by canonical positions
+        """
+        if self._symmetry is None:
+            return lines, 0
+
+        return self._symmetry.canonical(lines)
+
+    def _slot(self, lines):
+        """(int) -> int
+        Returns the transposition table slot of position <lines>
+        """
+        return (hash(lines) * _GOLDEN & _MASK64) >> self._shift
+
+    def _probe(self, lines):
+        """(int) -> tuple or NoneType
+        Returns the table entry (lines, depth, bound, value, move,
+        generation) stored for position <lines>, or None
+        """
+        entry = self._table[self._slot(lines)]
+
+        if entry is not None and entry[0] == lines:
+            return entry
+
+        return None
+
+    def _store(self, lines, depth, bound, value, move):
+        """
+        Stores the result of a search in the transposition table, unless
+        the slot holds a deeper result from the current search
+        """
+        slot = self._slot(lines)
+        entry = self._table[slot]
+
+        if entry is None or entry[0] == lines or entry[1] <= depth or \
+                entry[5] != self._generation:
+            self._table[slot] = (lines, depth, bound, value, move,
+                                 self._generation)
+
+    def _ordered(self, lines, free, first):
+        """(int, int, int) -> list
+        Returns the free lines of position <lines> in the order they should
+        be searched, starting with <first> (if it is free)
+        """
+        if first >= 0:
+            free &= ~(1 << first)
+
+        captures, safe, others = (list(iter_lines(mask)) for mask in
+                                  move_kinds(self._bordering, lines, free))
+
+        if first >= 0:
+            captures.insert(0, first)
+
+        return captures + safe + others
+
+    def _gained(self, after, line):
+        """(int, int) -> int
+        Returns the number of squares completed by adding <line>, giving
+        position <after>
+        """
+        gained = 0
+
+        for mask in self._bordering[line]:
+            if after & mask == mask:
+                gained += 1
+
+        return gained
+
+    def _search(self, lines, depth, alpha, beta):
+        """(int, int, int, int) -> int
+        Returns the value of position <lines> searched <depth> moves deep
+        within the window (<alpha>, <beta>)
+        """
+        self.nodes += 1
+        free = self._full & ~lines
+
+        if not free:
+            return 0
+
+        if depth == 0:
+            return 0    # Unknown beyond the horizon; count it as even
+
+        # Expanding a position costs more than reading the clock
+        if perf_counter() > self._deadline:
+            raise _Timeout()
+
+        first = -1
+        key, transform = self._canonical(lines)
+        entry = self._probe(key)
+
+        if entry is not None:
+            first = entry[4]
+            if transform:
+                first = self._symmetry.restore_line(first, transform)
+
+            if entry[1] >= depth:
+                bound, value = entry[2], entry[3]
+
+                if bound == _EXACT:
+                    return value
+
+                elif bound == _LOWER and value > alpha:
+                    alpha = value
+
+                elif bound == _UPPER and value < beta:
+                    beta = value
+
+                if alpha >= beta:
+                    return value
+
+        original_alpha = alpha
+        best_value, best_move = -(1 << 30), -1
+
+        for line in self._ordered(lines, free, first):
+            after = lines | (1 << line)
+            gained = self._gained(after, line)
+
+            # Completing a square keeps the turn, otherwise it passes over
+            if gained:
+                value = gained + self._search(after, depth - 1,
+                                              alpha - gained, beta - gained)
+            else:
+                value = -self._search(after, depth - 1, -beta, -alpha)
+
+            if value > best_value:
+                best_value, best_move = value, line
+
+                if value > alpha:
+                    alpha = value
+
+                    if alpha >= beta:
+                        break
+
+        if best_value <= original_alpha:
+            bound = _UPPER
+        elif best_value >= beta:
+            bound = _LOWER
+        else:
+            bound = _EXACT
+
+        if transform:
+            best_move = self._symmetry.map_line(best_move, transform)
+
+        self._store(key, depth, bound, best_value, best_move)
+        return best_value
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Columnar game archives
+
+Stores many games of one board size as a directory of flat binary columns,
+one value per game (or per move), which are memory-mapped for querying:
+
+    meta.json            board size and counts
+    offsets.bin          uint64 per game, plus one: the moves of game i are
+                         moves[offsets[i]:offsets[i + 1]]
+    moves.bin            the lines added, uint8 (uint16 on boards with more
+                         than 255 lines); a move too large to store, which
+                         cannot be a line of the board, is stored as the
+                         largest value (255 or 65535), so dot_validate
+                         still sees an illegal line
+    results.bin          uint8 per game, a dot_record result code
+    first_capture.bin    uint8 per game: 0 if no square was captured,
+                         otherwise the result code (1 X, 2 Y) of the player
+                         who captured the first square
+    x_scores.bin         uint16 per game, squares owned by player X
+    y_scores.bin         uint16 per game, squares owned by player Y; a
+                         score too large to store is stored as 65535, which
+                         no board of up to 65535 squares can reach, so
+                         dot_validate still sees a wrong score
+
+and three indexes, each a list of game ids (uint32) grouped by key, with
+the uint64 offsets of the groups; within a group the ids are in order:
+
+    result_index.bin     games grouped by result
+    result_offsets.bin
+    outcome_index.bin    games grouped by (result, first capture)
+    outcome_offsets.bin
+    position_index.bin   games grouped by every position (bitboard) they
+    position_offsets.bin pass through after a move; only built for boards
+                         of at most POSITION_INDEX_LINES lines
+
+Query answers are memoryviews straight into the mapped files; nothing is
+copied or replayed.
+
+Usage:
+    python3 dot_archive.py ARCHIVE RECORDS
+"""
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from dot_nxm_logic import bordering_masks
+from dot_nxm_logic import line_count
+from dot_record import GameRecord
+from dot_record import RESULT_CODES
+from dot_record import RESULTS
+from dot_record import read_records
+
+VERSION = 2
+
+# Largest board (in lines) with a position index; it holds an offset for
+# each of the 2 ** lines positions
+POSITION_INDEX_LINES = 20
+
+# Games buffered in memory before their columns are written out
+_FLUSH = 1 << 16
+
+# Columns: file name -> array type code (moves vary by board size)
+_COLUMNS = {'offsets': 'Q', 'results': 'B', 'first_capture': 'B',
+            'x_scores': 'H', 'y_scores': 'H'}
+
+# Largest score the score columns hold
+_SCORE_LIMIT = 0xFFFF
+
+# Outcome keys: result code * 3 + first capture
+_OUTCOMES = 12
+
+
+def _first_capture(moves, bordering):
+    """(sequence, tuple) -> int
+    Replays <moves> and returns 0 if no square was captured, 1 if player X
+    captured the first square and 2 if player Y did. The replay stops at an
+    illegal move
+    """
+    lines = 0
+    turn = 0
+
+    for line in moves:
+        if not 0 <= line < len(bordering) or lines >> line & 1:
+            return 0
+
+        lines |= 1 << line
+        captured = False
+
+        for mask in bordering[line]:
+            if lines & mask == mask:
+                captured = True
+
+        if captured:
+            return turn + 1
+
+        turn ^= 1
+
+    return 0
+
+
+def _mapped_output(path, type_code, count):
+    """(str, str, int) -> tuple
+    Creates the file <path> holding <count> zeroed values of <type_code>.
+    Returns (mmap, memoryview) for filling it in, or (None, None) if it is
+    empty
+    """
+    size = array(type_code).itemsize * count
+
+    with open(path, 'wb') as out:
+        out.truncate(size)
+
+    if not size:
+        return None, None
+
+    with open(path, 'r+b') as out:
+        mapped = mmap.mmap(out.fileno(), size)
+
+    return mapped, memoryview(mapped).cast(type_code)
+
+
+def _group(path, key_count, members):
+    """(str, int, callable) -> NoneType
+    Writes the index <path>_index.bin and <path>_offsets.bin, grouping game
+    ids by key. <members>() yields (game id, key) pairs; it is iterated twice,
+    once to size the groups and once to fill them
+    """
+    counts = array('Q', bytes(8 * (key_count + 1)))
+
+    for _, key in members():
+        counts[key + 1] += 1
+
+    for key in range(key_count):
+        counts[key + 1] += counts[key]
+
+    with open(path + '_offsets.bin', 'wb') as out:
+        counts.tofile(out)
+
+    cursors = array('Q', counts[:-1])
+    mapped, index = _mapped_output(path + '_index.bin', 'I', counts[-1])
+
+    if mapped is None:
+        return
+
+    for game, key in members():
+        index[cursors[key]] = game
+        cursors[key] += 1
+
+    index.release()
+    mapped.close()
+
+
+def build(directory, records, rows=3, cols=3):
+    """(str, iterable, int, int) -> int
+    Writes the archive <directory> from the GameRecords <records> of games
+    on a board of <rows> x <cols> dots, reading them once, in order.
+    Raises ValueError on a record of another board size.
+    Returns the number of games archived
+    """
+    os.makedirs(directory, exist_ok=True)
+    lines = line_count(rows, cols)
+    move_code = 'B' if lines <= 255 else 'H'
+    largest = (1 << 8 * array(move_code).itemsize) - 1
+    bordering = bordering_masks(rows, cols)
+
+    def column(name):
+        return os.path.join(directory, name + '.bin')
+
+    buffers = {name: array(code) for name, code in _COLUMNS.items()}
+    buffers['moves'] = array(move_code)
+    files = {name: open(column(name), 'wb') for name in buffers}
+
+    games = moves = 0
+    buffers['offsets'].append(0)
+
+    try:
+        for record in records:
+            if (record.rows, record.cols) != (rows, cols):
+                raise ValueError('Game {0} is not on a {1}x{2} board'.format(
+                    games, rows, cols))
+
+            if record.moves and max(record.moves) > largest:
+                buffers['moves'].extend(min(line, largest)
+                                        for line in record.moves)
+            else:
+                buffers['moves'].extend(record.moves)
+            moves += len(record.moves)
+            buffers['offsets'].append(moves)
+            buffers['results'].append(RESULT_CODES[record.result])
+            buffers['first_capture'].append(
+                _first_capture(record.moves, bordering))
+            buffers['x_scores'].append(min(record.x_score, _SCORE_LIMIT))
+            buffers['y_scores'].append(min(record.y_score, _SCORE_LIMIT))
+            games += 1
+
+            if not games % _FLUSH:
+                for name, values in buffers.items():
+                    values.tofile(files[name])
+                    del values[:]
+
+        for name, values in buffers.items():
+            values.tofile(files[name])
+    finally:
+        for out in files.values():
+            out.close()
+
+    with open(os.path.join(directory, 'meta.json'), 'w') as meta:
+        json.dump({'version': VERSION, 'rows': rows, 'cols': cols,
+                   'games': games, 'moves': moves,
+                   'position_index': lines <= POSITION_INDEX_LINES}, meta)
+
+    # The indexes are built from the columns just written
+    archive = Archive(directory, indexes=False)
+
+    try:
+        def outcomes():
+            for game in range(games):
+                yield game, archive.results[game] * 3 + \
+                        archive.first_capture[game]
+
+        def results():
+            for game in range(games):
+                yield game, archive.results[game]
+
+        _group(os.path.join(directory, 'result'), len(RESULTS), results)
+        _group(os.path.join(directory, 'outcome'), _OUTCOMES, outcomes)
+
+        if lines <= POSITION_INDEX_LINES:
+            def positions():
+                offsets, game_moves = archive.offsets, archive.moves
+                for game in range(games):
+                    position = 0
+                    for index in range(offsets[game], offsets[game + 1]):
+                        line = game_moves[index]
+                        # Stop at an illegal move (see dot_validate)
+                        if line >= lines or position >> line & 1:
+                            break
+                        position |= 1 << line
+                        yield game, position
+
+            _group(os.path.join(directory, 'position'), 1 << lines,
+                   positions)
+    finally:
+        archive.close()
+
+    return games
+
+
+class Archive:
+    """Read-only, memory-mapped archive written by build().
+
+    The columns are available as memoryviews: offsets, moves, results,
+    first_capture, x_scores and y_scores
+    """
+
+    def __init__(self, directory, indexes=True):
+        with open(os.path.join(directory, 'meta.json')) as meta:
+            self.meta = json.load(meta)
+
+        if self.meta['version'] != VERSION:
+            raise ValueError('{0} is not a version {1} archive'.format(
+                directory, VERSION))
+
+        self.rows = self.meta['rows']
+        self.cols = self.meta['cols']
+        self._maps = []
+        lines = line_count(self.rows, self.cols)
+
+        codes = dict(_COLUMNS, moves='B' if lines <= 255 else 'H')
+        if indexes:
+            codes.update(result_index='I', result_offsets='Q',
+                         outcome_index='I', outcome_offsets='Q')
+            if self.meta['position_index']:
+                codes.update(position_index='I', position_offsets='Q')
+
+        for name, code in codes.items():
+            setattr(self, name,
+                    self._map(os.path.join(directory, name + '.bin'), code))
+
+    def _map(self, path, type_code):
+        """(str, str) -> memoryview
+        Maps the column file <path> holding values of <type_code>
+        """
+        if not os.path.getsize(path):
+            return memoryview(array(type_code))
+
+        with open(path, 'rb') as column:
+            mapped = mmap.mmap(column.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._maps.append(mapped)
+        view = memoryview(mapped).cast(type_code)
+        self._maps.append(view)
+        return view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.meta['games']
+
+    def close(self):
+        """
+        Unmaps the archive. It cannot be used afterwards. A file still
+        referenced by a query answer stays mapped until the answer is gone
+        """
+        for item in reversed(self._maps):
+            if isinstance(item, memoryview):
+                item.release()
+            else:
+                try:
+                    item.close()
+                except BufferError:
+                    pass
+        self._maps = []
+
+    def game_moves(self, game):
+        """(int) -> memoryview
+        Returns the lines added in game number <game>, in order
+        """
+        return self.moves[self.offsets[game]:self.offsets[game + 1]]
+
+    def game(self, game):
+        """(int) -> GameRecord
+        Returns the record of game number <game>
+        """
+        return GameRecord(self.rows, self.cols,
+                          RESULTS[self.results[game]], self.x_scores[game],
+                          self.y_scores[game], tuple(self.game_moves(game)))
+
+    def _outcomes(self, first, last):
+        """(int, int) -> memoryview
+        Returns the ids of the games with outcome keys <first> to <last>;
+        keys that are next to each other share a contiguous run of ids,
+        grouped by key
+        """
+        offsets = self.outcome_offsets
+        return self.outcome_index[offsets[first]:offsets[last + 1]]
+
+    def games_with_result(self, result, first_capture=None):
+        """(str, str) -> memoryview
+        Returns the ids, in order, of the games with <result> ('X', 'Y',
+        'Draw' or None for unfinished games). Given <first_capture> ('X' or
+        'Y', or '' for games without captures), returns only the games in
+        which that player captured the first square
+        """
+        if first_capture is None:
+            code = RESULT_CODES[result]
+            offsets = self.result_offsets
+            return self.result_index[offsets[code]:offsets[code + 1]]
+
+        key = RESULT_CODES[result] * 3 + RESULT_CODES[first_capture or None]
+        return self._outcomes(key, key)
+
+    def games_through(self, position):
+        """(int) -> memoryview
+        Returns the ids, in order, of the games that reached the position
+        <position> (a bitboard) after one of their moves.
+        Raises ValueError if the archive has no position index
+        """
+        if not self.meta['position_index']:
+            raise ValueError('The archive has no position index')
+
+        offsets = self.position_offsets
+        return self.position_index[offsets[position]:offsets[position + 1]]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__.rsplit('Usage:', 1)[1].strip())
+        sys.exit(2)
+
+    with open(sys.argv[2], 'rb') as record_file:
+        stream = read_records(record_file)
+        first = next(stream, None)
+
+        if first is None:
+            print('No games in {0}'.format(sys.argv[2]))
+            sys.exit(1)
+
+        def all_records():
+            yield first
+            yield from stream
+
+        count = build(sys.argv[1], all_records(), first.rows, first.cols)
+
+    print('Archived {0} games in {1}'.format(count, sys.argv[1]))
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""Caches of chosen moves
+
+A CachedPlayer sits in front of any player with a choose_move(lines) or
+choose_move(lines, margin) method (see dot_tournament) and remembers the
+move it chose for every position (and margin), so a position seen before
+costs a table probe instead of a search. Positions are keyed by their
+canonical form (see dot_symmetry): the move is stored for the canonical
+form and mapped back, so the rotations and mirror images of a position
+share one entry.
+
+Two caches are provided, both bounded by a memory budget in bytes and both
+counting their hits, misses and evictions:
+
+    EvalCache        a dictionary in the process, evicting the least
+                     recently used entry
+    SharedEvalCache  a table in shared memory that worker processes attach
+                     to by name, evicting with the CLOCK algorithm: each
+                     entry has a reference bit set when it is used, and a
+                     clock hand clears the bits until it finds an entry
+                     that has not been used since its last visit
+
+Processes share a SharedEvalCache without locks. Every entry is a single
+64-bit word (key and move), so a reader sees either the old entry or the
+new one, and a CachedPlayer checks that a cached move is free before
+playing it.
+"""
+from collections import OrderedDict
+from inspect import signature
+from multiprocessing import shared_memory
+
+from dot_nxm_logic import line_count
+from dot_symmetry import symmetry
+
+# Default memory budget of a cache in bytes
+DEFAULT_BYTES = 16 << 20
+
+# Bytes taken by an EvalCache entry: the key, the move and the dictionary
+# bookkeeping, measured for keys of up to 64 bits
+_ENTRY_BYTES = 144
+
+# Entries of a SharedEvalCache bucket; a key can only live in its bucket
+_WAYS = 4
+
+# A SharedEvalCache entry packs the key (48 bits, plus one so 0 means
+# empty) above the move (16 bits)
+_KEY_BITS = 48
+_KEY_LIMIT = (1 << _KEY_BITS) - 1
+_MOVE_MASK = 0xFFFF
+
+# Low bits of a CachedPlayer key holding the margin, for players that take
+# one; margins are kept modulo 2**_MARGIN_BITS
+_MARGIN_BITS = 8
+_MARGIN_MASK = (1 << _MARGIN_BITS) - 1
+
+# Multiplier for spreading keys over the buckets
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+class EvalCache:
+    """Least recently used cache of moves by position key, holding as many
+    entries as fit in <max_bytes>
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BYTES):
+        self.capacity = max(1, max_bytes // _ENTRY_BYTES)
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """(int) -> int or NoneType
+        Returns the move cached for <key>, or None
+        """
+        move = self._entries.get(key)
+
+        if move is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return move
+
+    def put(self, key, move):
+        """(int, int) -> NoneType
+        Caches <move> for <key>, evicting the least recently used entry if
+        the cache is full
+        """
+        entries = self._entries
+        entries[key] = move
+        entries.move_to_end(key)
+
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Empties the cache; the counters are kept
+        """
+        self._entries.clear()
+
+    def stats(self):
+        """() -> dict
+        Returns the entries held and the hit, miss and eviction counts
+        """
+        return {'entries': len(self), 'capacity': self.capacity,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+
+class SharedEvalCache:
+    """CLOCK cache of moves by position key in shared memory of at most
+    <max_bytes>. Creates the memory, or attaches to the cache called <name>
+    made by another process. A SharedEvalCache passed to a worker process
+    attaches to the same memory there.
+
+    The counters count the lookups of this process only.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BYTES, name=None):
+        if name is None:
+            # Eight bytes per entry, plus a reference byte per entry and a
+            # clock hand byte per bucket
+            buckets = max(1, max_bytes // (9 * _WAYS + 1))
+            self._memory = shared_memory.SharedMemory(
+                create=True, size=buckets * (9 * _WAYS + 1))
+            self._owner = True
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+            buckets = self._memory.size // (9 * _WAYS + 1)
+            self._owner = False
+
+        slots = buckets * _WAYS
+        buffer = self._memory.buf
+        self._entries = buffer[:8 * slots].cast('Q')
+        self._referenced = buffer[8 * slots:9 * slots]
+        self._hands = buffer[9 * slots:9 * slots + buckets]
+        self._buckets = buckets
+        self.capacity = slots
+        self.hits = self.misses = self.evictions = 0
+
+    def __reduce__(self):
+        return (SharedEvalCache, (0, self.name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def name(self):
+        """Name other processes attach to the cache by"""
+        return self._memory.name
+
+    def _bucket(self, key):
+        """(int) -> int
+        Returns the first slot of the bucket of <key>
+        """
+        return ((key * _GOLDEN & _MASK64) % self._buckets) * _WAYS
+
+    @staticmethod
+    def _tag(key):
+        """(int) -> int
+        Returns the key as stored in an entry: the key itself, plus one, if
+        it fits in 48 bits, otherwise a 48-bit fingerprint of it
+        """
+        if key >= _KEY_LIMIT:
+            key = (hash(key) * _GOLDEN & _MASK64) % _KEY_LIMIT
+
+        return (key + 1) << 16
+
+    def get(self, key):
+        """(int) -> int or NoneType
+        Returns the move cached for <key>, or None
+        """
+        tag = self._tag(key)
+        entries = self._entries
+        first = self._bucket(key)
+
+        for slot in range(first, first + _WAYS):
+            entry = entries[slot]
+            if entry & ~_MOVE_MASK == tag:
+                self._referenced[slot] = 1
+                self.hits += 1
+                move = entry & _MOVE_MASK
+                return move - 0x10000 if move & 0x8000 else move
+
+        self.misses += 1
+        return None
+
+    def put(self, key, move):
+        """(int, int) -> NoneType
+        Caches <move> for <key>, evicting an entry of its bucket that has
+        not been used since the clock hand last passed it if the bucket is
+        full
+        """
+        tag = self._tag(key)
+        entries = self._entries
+        referenced = self._referenced
+        first = self._bucket(key)
+        free = None
+
+        for slot in range(first, first + _WAYS):
+            entry = entries[slot]
+            if entry & ~_MOVE_MASK == tag:
+                free = slot
+                break
+            if not entry and free is None:
+                free = slot
+
+        if free is None:
+            # Sweep the hand round the bucket, giving every referenced
+            # entry a second chance
+            hand = self._hands[first // _WAYS]
+            while referenced[first + hand]:
+                referenced[first + hand] = 0
+                hand = (hand + 1) % _WAYS
+            free = first + hand
+            self._hands[first // _WAYS] = (hand + 1) % _WAYS
+            self.evictions += 1
+
+        entries[free] = tag | move & _MOVE_MASK
+        referenced[free] = 1
+
+    def __len__(self):
+        return sum(1 for entry in self._entries if entry)
+
+    def clear(self):
+        """
+        Empties the cache for every process; the counters are kept
+        """
+        self._memory.buf[:] = bytes(self._memory.size)
+
+    def stats(self):
+        """() -> dict
+        Returns the entries held and the hit, miss and eviction counts
+        """
+        return {'entries': len(self), 'capacity': self.capacity,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+    def __del__(self):
+        # Views into the memory must go before it can be closed, e.g. in a
+        # worker process that never calls close()
+        if getattr(self, '_memory', None) is not None:
+            self._detach()
+
+    def _detach(self):
+        """
+        Releases the views into the shared memory and closes it
+        """
+        for view in (self._entries, self._referenced, self._hands):
+            view.release()
+
+        self._memory.close()
+
+    def close(self):
+        """
+        Detaches this process from the cache, removing the shared memory if
+        this process made it
+        """
+        if self._memory is None:
+            return
+
+        self._detach()
+
+        if self._owner:
+            self._memory.unlink()
+
+        self._memory = None
+
+
+class CachedPlayer:
+    """Plays the moves of <player> for a board of <rows> x <cols> dots,
+    asking it only about positions not in <cache> (by default a new
+    EvalCache). If <player> takes a <margin> (see dot_tournament), the
+    margin is passed on and is part of the key, so a move chosen for one
+    lead is not replayed for another
+    """
+
+    def __init__(self, player, rows=3, cols=3, cache=None):
+        self.player = player
+        self.cache = EvalCache() if cache is None else cache
+        self._symmetry = symmetry(rows, cols)
+        self._lines = line_count(rows, cols)
+        self._margin = 'margin' in signature(player.choose_move).parameters
+
+    def choose_move(self, lines, margin=0):
+        """(int, int) -> int or NoneType
+        Returns the line to add in position <lines>, with the player to move
+        leading by <margin> squares, or None if the board is full
+        """
+        key, transform = self._symmetry.canonical(lines)
+
+        if self._margin:
+            key = key << _MARGIN_BITS | margin & _MARGIN_MASK
+
+        move = self.cache.get(key)
+
+        if move is not None and 0 <= move < self._lines:
+            move = self._symmetry.restore_line(move, transform)
+            if not lines >> move & 1:
+                return move
+
+        if self._margin:
+            move = self.player.choose_move(lines, margin=margin)
+        else:
+            move = self.player.choose_move(lines)
+
+        if move is not None:
+            self.cache.put(key, self._symmetry.map_line(move, transform))
+
+        return move
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""Chain and loop endgames
+
+Late in a game every free line gives squares away, and the open squares
+fall apart into chains and loops. Seen as strings and coins, every open
+square (a coin) is tied to its neighbours, or to the edge of the board (the
+ground), by its free lines. When every open square has exactly two lines
+left, each group of open squares is:
+
+    a chain  - a path of squares between two ground lines, or
+    a loop   - a cycle of squares with no ground line.
+
+Whoever adds a line in such a position opens a chain or a loop, and the
+opponent chooses between taking every square of it and moving next, or
+taking all but two squares of a chain (all but four of a loop) and handing
+those over with a double-dealing move, which keeps the opponent moving:
+
+    opening a chain of n squares, n <= 2:   opponent gets n + V(rest)
+    opening a chain of n squares, n >= 3:   opponent gets
+                                            max(n + V(rest), n - 4 - V(rest))
+    opening a loop of n squares:            opponent gets
+                                            max(n + V(rest), n - 8 - V(rest))
+
+where V(rest) is the value of the other groups for the player who moves in
+them. A chain of two squares is opened in the middle, so the opponent
+cannot double-deal it. The value of a position is the best of its openings;
+it is memoised by the lengths of the chains and loops, so any position with
+the same groups is solved once.
+
+A position may also hold opened groups, the squares that can be captured
+now: the player to move takes them all and moves on, or hands over the last
+two squares of one opened chain (four of an opened loop).
+
+Values are margins of the squares still open, for the player to move, as in
+dot_ai. analyze() returns None for a position that is not such an endgame,
+i.e. one with an open square with fewer than two lines, or a safe move.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from dot_nxm_logic import line_count
+from dot_nxm_logic import line_squares
+from dot_nxm_logic import square_count
+from dot_nxm_logic import square_lines
+
+# Squares given away by double-dealing a chain and a loop
+_CHAIN_COST = 4
+_LOOP_COST = 8
+
+# Chains of at least this many squares can be double-dealt
+_LONG_CHAIN = 3
+
+Analysis = namedtuple('Analysis',
+                      'value move chains loops captures controlled')
+Analysis.__doc__ = """The solution of an endgame position:
+    value      - margin of the open squares for the player to move
+    move       - a best line to add
+    chains     - lengths of the unopened chains, in increasing order
+    loops      - lengths of the unopened loops, in increasing order
+    captures   - squares that can be captured now
+    controlled - margin the player in control gets from the unopened long
+                 chains and loops by keeping control to the end: declining
+                 two squares of every long chain and four of every loop but
+                 the last, or None if there are none"""
+
+
+def _without(lengths, index):
+    """(tuple, int) -> tuple
+    Returns <lengths> without the item at <index>
+    """
+    return lengths[:index] + lengths[index + 1:]
+
+
+@lru_cache(maxsize=None)
+def _solve(chains, loops):
+    """(tuple, tuple) -> tuple
+    Returns (value, 'chain' or 'loop', length) of the simple position with
+    the unopened <chains> and <loops> (sorted lengths): its value for the
+    player to move, and the group to open. Returns (0, None, 0) if there are
+    no groups
+    """
+    best = (-(1 << 30), None, 0)
+
+    for index, length in enumerate(chains):
+        if index and chains[index - 1] == length:
+            continue
+        rest = _solve(_without(chains, index), loops)[0]
+        if length < _LONG_CHAIN:
+            given = length + rest
+        else:
+            given = max(length + rest, length - _CHAIN_COST - rest)
+        if -given > best[0]:
+            best = (-given, 'chain', length)
+
+    for index, length in enumerate(loops):
+        if index and loops[index - 1] == length:
+            continue
+        rest = _solve(chains, _without(loops, index))[0]
+        given = max(length + rest, length - _LOOP_COST - rest)
+        if -given > best[0]:
+            best = (-given, 'loop', length)
+
+    if best[1] is None:
+        return (0, None, 0)
+
+    return best
+
+
+def controlled_value(chains, loops):
+    """(iterable, iterable) -> int or NoneType
+    Returns the margin the player in control gets from the long chains and
+    the loops among <chains> and <loops> (lengths) by keeping control to the
+    end, or None if there are none
+    """
+    chains = [length for length in chains if length >= _LONG_CHAIN]
+    loops = list(loops)
+
+    if not chains and not loops:
+        return None
+
+    value = sum(chains) + sum(loops) - _CHAIN_COST * len(chains) - \
+        _LOOP_COST * len(loops)
+
+    # The last group is taken whole; a chain is kept for last if there is one
+    return value + (_CHAIN_COST if chains else _LOOP_COST)
+
+
+class _Group:
+    """A chain or loop of open squares in order: <squares>, and <lines>, the
+    free lines before, between and after them. A path has one more line
+    than squares; the first or last is None where the end square can be
+    captured. A loop has as many lines as squares, line i joining square i
+    to square i + 1
+    """
+    __slots__ = ('squares', 'lines', 'loop')
+
+    def __init__(self, squares, lines, loop):
+        self.squares = squares
+        self.lines = lines
+        self.loop = loop
+
+    def __len__(self):
+        return len(self.squares)
+
+    def opened(self):
+        """() -> int
+        Returns the number of ends that can be captured now
+        """
+        if self.loop:
+            return 0
+        return (self.lines[0] is None) + (self.lines[-1] is None)
+
+
+class EndgameAnalyzer:
+    """Solves the chain and loop endgames of a board of <rows> x <cols> dots
+    """
+
+    def __init__(self, rows=3, cols=3):
+        self.rows = rows
+        self.cols = cols
+        squares = square_count(rows, cols)
+
+        # Line mask of every square and the squares bordering every line
+        self._square_lines = tuple(square_lines(rows, cols, sq)
+                                   for sq in range(squares))
+        self._masks = tuple(sum(1 << line for line in lines)
+                            for lines in self._square_lines)
+        self._line_squares = tuple(line_squares(rows, cols, line)
+                                   for line in range(line_count(rows, cols)))
+
+    def _links(self, lines):
+        """(int) -> dict or NoneType
+        Returns, for every open square of position <lines>, its free lines
+        as (line, square across it or None for the ground) pairs. Returns
+        None if a square has more than two free lines
+        """
+        links = {}
+
+        for sq, mask in enumerate(self._masks):
+            if lines & mask == mask:
+                continue
+
+            free = [line for line in self._square_lines[sq]
+                    if not lines >> line & 1]
+
+            if len(free) > 2:
+                return None
+
+            links[sq] = [(line, next((other for other in
+                                      self._line_squares[line]
+                                      if other != sq), None))
+                         for line in free]
+
+        return links
+
+    def _groups(self, links):
+        """(dict) -> list
+        Returns the groups of the open squares in <links>. Paths start at an
+        end that can be captured, if they have one
+        """
+        groups = []
+        seen = set()
+
+        # Paths from their ends first: capturable ends, then ground ends
+        ends = sorted((sq for sq, free in links.items()
+                       if len(free) == 1 or
+                       any(other is None for _, other in free)),
+                      key=lambda sq: len(links[sq]))
+
+        for start in ends:
+            if start in seen:
+                continue
+
+            squares, path = [start], []
+            free = links[start]
+
+            if len(free) == 1:
+                path.append(None)
+                line, other = free[0]
+            else:
+                # Leave by the line that is not a ground line, if any
+                (ground, _), (line, other) = sorted(
+                    free, key=lambda link: link[1] is not None)
+                path.append(ground)
+
+            seen.add(start)
+
+            while True:
+                path.append(line)
+                if other is None:
+                    break
+                squares.append(other)
+                seen.add(other)
+                onward = [link for link in links[other] if link[0] != line]
+                if not onward:
+                    path.append(None)
+                    break
+                line, other = onward[0]
+
+            groups.append(_Group(squares, path, False))
+
+        # Whatever is left lies on loops
+        for start in links:
+            if start in seen:
+                continue
+
+            squares, path = [start], []
+            seen.add(start)
+            line, other = links[start][0]
+
+            while other != start:
+                path.append(line)
+                squares.append(other)
+                seen.add(other)
+                line, other = next(link for link in links[other]
+                                   if link[0] != line)
+
+            path.append(line)
+            groups.append(_Group(squares, path, True))
+
+        return groups
+
+    def analyze(self, lines):
+        """(int) -> Analysis or NoneType
+        Solves position <lines>. Returns None if it is not a chain and loop
+        endgame
+        """
+        links = self._links(lines)
+
+        if not links:
+            return None
+
+        groups = self._groups(links)
+        opened = [group for group in groups if group.opened()]
+        closed = [group for group in groups if not group.opened()]
+
+        chains = tuple(sorted(len(group) for group in closed
+                              if not group.loop))
+        loops = tuple(sorted(len(group) for group in closed if group.loop))
+        captures = sum(len(group) for group in opened)
+        controlled = controlled_value(chains, loops)
+        rest, kind, length = _solve(chains, loops)
+
+        if not opened:
+            group = next(group for group in closed
+                         if group.loop == (kind == 'loop') and
+                         len(group) == length)
+            return Analysis(rest, self._opening(group), chains, loops, 0,
+                            controlled)
+
+        # Take everything, or hand over the end of one opened group
+        value = captures + rest
+        move = self._capture(opened[0])
+        dealt = None
+
+        for group in opened:
+            cost = self._dealing_cost(group)
+            if cost is not None and captures - cost - rest > value:
+                value = captures - cost - rest
+                dealt = group
+
+        if dealt is not None:
+            others = [group for group in opened if group is not dealt]
+            move = self._capture(others[0]) if others else \
+                self._deal(dealt)
+
+        return Analysis(value, move, chains, loops, captures, controlled)
+
+    @staticmethod
+    def _opening(group):
+        """(_Group) -> int
+        Returns the line that opens <group> best: the middle of a chain of
+        two squares (a hard-hearted handout), otherwise an end
+        """
+        if not group.loop and len(group) == 2:
+            return group.lines[1]
+
+        return group.lines[0]
+
+    @staticmethod
+    def _capture(group):
+        """(_Group) -> int
+        Returns a line that captures the end square of the opened <group>
+        """
+        if group.lines[0] is None:
+            return group.lines[1]
+
+        return group.lines[-2]
+
+    @staticmethod
+    def _dealing_cost(group):
+        """(_Group) -> int or NoneType
+        Returns the squares given away by double-dealing the opened <group>,
+        or None if it cannot be double-dealt
+        """
+        if group.opened() == 1 and len(group) >= 2:
+            return _CHAIN_COST
+
+        if group.opened() == 2 and len(group) >= 4:
+            return _LOOP_COST
+
+        return None
+
+    @staticmethod
+    def _deal(group):
+        """(_Group) -> int
+        Returns the next line of taking all but the last squares of the
+        opened <group> and handing those over. Paths start at a capturable
+        end
+        """
+        if group.opened() == 1:
+            if len(group) > 2:
+                return group.lines[1]
+            return group.lines[2]       # Close the far end of the last two
+
+        if len(group) > 4:
+            return group.lines[1]
+        return group.lines[2]           # Split the last four in two pairs
+
+
+# Analyzers by board size, made on first use
+_analyzers = {}
+
+def analyzer(rows=3, cols=3):
+    """(int, int) -> EndgameAnalyzer
+    Returns the endgame analyzer of a board of <rows> x <cols> dots
+    """
+    found = _analyzers.get((rows, cols))
+
+    if found is None:
+        found = _analyzers[rows, cols] = EndgameAnalyzer(rows, cols)
+
+    return found
+
+def analyze(lines, rows=3, cols=3):
+    """(int, int, int) -> Analysis or NoneType
+    Solves the position <lines> on a board of <rows> x <cols> dots, or
+    returns None if it is not a chain and loop endgame
+    """
+    return analyzer(rows, cols).analyze(lines)
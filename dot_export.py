@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""Board images without a display
+
+Draws positions the way dot_3x3_turtle shows them - black lines, black dots
+and the blue marks of draw_X and draw_Y in the captured squares - straight
+to SVG or PNG files, so images can be made on machines without a display.
+Both formats are written in pure Python: PNG images are rasterised here and
+compressed with zlib.
+
+A position is (lines, owners): the bitboard of the lines and one byte per
+square, 0 for nobody, 1 for player X and 2 for player Y, as in the owners
+of a dot_nxm_logic.Board. Coordinates come from dot_geometry, in a window
+of 600 x 600 units scaled to the size of the image.
+
+export_games() renders the final positions of recorded games, or every
+position they pass through, across a pool of worker processes. Identical
+positions are rendered once and written to every file that shows them.
+
+Usage:
+    python3 dot_export.py GAMES DIRECTORY [--format png|svg] [--size N]
+                          [--every-move] [--workers N]
+
+where GAMES is an archive directory (see dot_archive) or a record stream
+(see dot_record).
+"""
+import argparse
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from math import ceil
+from math import floor
+
+from dot_archive import Archive
+from dot_geometry import geometry
+from dot_nxm_logic import Board
+from dot_nxm_logic import iter_lines
+from dot_record import read_records
+
+FORMATS = ('png', 'svg')
+
+# Units of the window the board is laid out in (see dot_geometry)
+WINDOW = 600
+
+# Pen widths of dot_3x3_turtle, for dots 200 units apart
+LINE_WIDTH = 5
+MARK_WIDTH = 10
+TURTLE_SPACING = 200
+
+# Palette of the images: background, lines and dots, marks
+_WHITE, _BLACK, _BLUE = 0, 1, 2
+_PALETTE = ((255, 255, 255), (0, 0, 0), (0, 0, 255))
+_SVG_COLORS = ('white', 'black', 'blue')
+
+# Distinct positions sent to a worker at a time
+CHUNK = 256
+
+# Rendered images kept by each process
+_RENDER_CACHE = 1 << 10
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def board_position(board):
+    """(Board or GameState) -> tuple
+    Returns the position (lines, owners) of a dot_nxm_logic.Board or a
+    dot_3x3_logic.GameState
+    """
+    owners = board.owners
+
+    if isinstance(owners, int):
+        # GameState packs X's squares in the low nibble, Y's in the high one
+        owners = bytes(1 if owners >> sq & 1 else 2 if owners >> 4 + sq & 1
+                       else 0 for sq in range(4))
+
+    return board.lines, bytes(owners)
+
+
+def _strokes(lines, owners, rows, cols):
+    """(int, bytes, int, int) -> list
+    Returns the strokes that draw a position, in drawing order: lines, then
+    marks, then dots. A stroke is (color, width, x1, y1, x2, y2) with round
+    ends; a dot is a stroke of no length. Coordinates are window units with
+    the origin at the top left
+    """
+    layout = geometry(rows, cols, WINDOW, WINDOW)
+    scale = max(layout.spacing / TURTLE_SPACING, 1 / LINE_WIDTH)
+    strokes = []
+
+    for line in iter_lines(lines):
+        x_pos1, y_pos1, x_pos2, y_pos2 = layout.line_points[line]
+        strokes.append((_BLACK, LINE_WIDTH * scale, x_pos1, WINDOW - y_pos1,
+                        x_pos2, WINDOW - y_pos2))
+
+    size = layout.mark_size
+    for sq, owner in enumerate(owners):
+        if not owner:
+            continue
+        x_pos, y_pos = layout.square_points[sq]
+        y_pos = WINDOW - y_pos
+        if owner == 1:
+            segments = ((-size, -size, size, size), (-size, size, size, -size))
+        else:
+            segments = ((-size, -size, 0, 0), (size, -size, 0, 0),
+                        (0, 0, 0, size))
+        for x_from, y_from, x_to, y_to in segments:
+            strokes.append((_BLUE, MARK_WIDTH * scale, x_pos + x_from,
+                            y_pos + y_from, x_pos + x_to, y_pos + y_to))
+
+    diameter = 2 * layout.dot_radius
+    for x_pos, y_pos in layout.dot_points:
+        strokes.append((_BLACK, diameter, x_pos, WINDOW - y_pos,
+                        x_pos, WINDOW - y_pos))
+
+    return strokes
+
+
+##############################################################################
+# NOTE: SVG
+#-----------------------------------------------------------------------------
+
+def _svg_number(value):
+    """(float) -> str
+    Returns <value> with at most two decimals
+    """
+    return '{0:.2f}'.format(value).rstrip('0').rstrip('.')
+
+
+def render_svg(lines, owners, rows=3, cols=3, size=WINDOW):
+    """(int, bytes, int, int, int) -> str
+    Returns the SVG image, <size> pixels square, of the position <lines>,
+    <owners> on a board of <rows> x <cols> dots
+    """
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="{0}" '
+             'height="{0}" viewBox="0 0 {1} {1}">'.format(size, WINDOW),
+             '<rect width="{0}" height="{0}" fill="white"/>'.format(WINDOW),
+             '<g stroke-linecap="round" fill="black">']
+
+    for color, width, x_pos1, y_pos1, x_pos2, y_pos2 in \
+            _strokes(lines, owners, rows, cols):
+        if x_pos1 == x_pos2 and y_pos1 == y_pos2:
+            parts.append('<circle cx="{0}" cy="{1}" r="{2}"/>'.format(
+                _svg_number(x_pos1), _svg_number(y_pos1),
+                _svg_number(width / 2)))
+        else:
+            parts.append('<line x1="{0}" y1="{1}" x2="{2}" y2="{3}" '
+                         'stroke="{4}" stroke-width="{5}"/>'.format(
+                             _svg_number(x_pos1), _svg_number(y_pos1),
+                             _svg_number(x_pos2), _svg_number(y_pos2),
+                             _SVG_COLORS[color], _svg_number(width)))
+
+    parts.append('</g></svg>\n')
+    return '\n'.join(parts)
+
+
+##############################################################################
+# NOTE: PNG
+#-----------------------------------------------------------------------------
+
+def _span(x_pos1, y_pos1, x_pos2, y_pos2, radius, y_pos):
+    """(float, float, float, float, float, float) -> tuple or NoneType
+    Returns the (low, high) x range where the row at <y_pos> crosses the
+    stroke from (x_pos1, y_pos1) to (x_pos2, y_pos2) with round ends of
+    <radius>, or None if it does not. A stroke is convex, so the row
+    crosses it in one range: the union of the ranges of its two end discs
+    and of the band between them
+    """
+    low, high = float('inf'), float('-inf')
+
+    for x_end, y_end in ((x_pos1, y_pos1), (x_pos2, y_pos2)):
+        rise = y_pos - y_end
+        if abs(rise) <= radius:
+            half = (radius * radius - rise * rise) ** 0.5
+            low, high = min(low, x_end - half), max(high, x_end + half)
+
+    x_dir, y_dir = x_pos2 - x_pos1, y_pos2 - y_pos1
+    length = (x_dir * x_dir + y_dir * y_dir) ** 0.5
+
+    if length:
+        # Inside the band the point projects between the ends and lies
+        # within <radius> of the stroke; both are linear in x along the row
+        band_low, band_high = float('-inf'), float('inf')
+        rise = y_pos - y_pos1
+        for slope, offset, least, most in (
+                (x_dir, y_dir * rise, 0, length * length),
+                (-y_dir, x_dir * rise, -radius * length, radius * length)):
+            if slope:
+                ends = sorted(((least - offset) / slope + x_pos1,
+                               (most - offset) / slope + x_pos1))
+                band_low = max(band_low, ends[0])
+                band_high = min(band_high, ends[1])
+            elif not least <= offset <= most:
+                band_low, band_high = 1, 0
+        if band_low <= band_high:
+            low, high = min(low, band_low), max(high, band_high)
+
+    if low > high:
+        return None
+
+    return low, high
+
+
+def _raster(strokes, size):
+    """(list, int) -> bytearray
+    Returns the palette indexes of a <size> x <size> image of <strokes>,
+    row by row, each row preceded by its PNG filter byte (0, none). A pixel
+    takes the color of the last stroke covering its centre
+    """
+    stride = size + 1
+    pixels = bytearray(stride * size)
+    scale = size / WINDOW
+
+    for color, width, x_pos1, y_pos1, x_pos2, y_pos2 in strokes:
+        x_pos1, y_pos1 = x_pos1 * scale, y_pos1 * scale
+        x_pos2, y_pos2 = x_pos2 * scale, y_pos2 * scale
+        radius = max(width * scale / 2, 0.5)
+        fill = bytes((color,)) * size
+
+        top = max(0, int(min(y_pos1, y_pos2) - radius))
+        bottom = min(size, int(max(y_pos1, y_pos2) + radius) + 1)
+
+        for row in range(top, bottom):
+            span = _span(x_pos1, y_pos1, x_pos2, y_pos2, radius, row + 0.5)
+            if span is None:
+                continue
+            first = max(0, ceil(span[0] - 0.5))
+            last = min(size - 1, floor(span[1] - 0.5))
+            if first <= last:
+                start = row * stride + 1 + first
+                pixels[start:start + last - first + 1] = \
+                    fill[:last - first + 1]
+
+    return pixels
+
+
+def _chunk(kind, data):
+    """(bytes, bytes) -> bytes
+    Returns the PNG chunk <kind> holding <data>
+    """
+    return struct.pack('>I', len(data)) + kind + data + \
+        struct.pack('>I', zlib.crc32(kind + data))
+
+
+def render_png(lines, owners, rows=3, cols=3, size=WINDOW):
+    """(int, bytes, int, int, int) -> bytes
+    Returns the PNG image, <size> pixels square, of the position <lines>,
+    <owners> on a board of <rows> x <cols> dots
+    """
+    pixels = _raster(_strokes(lines, owners, rows, cols), size)
+
+    # 8-bit palette image
+    header = struct.pack('>IIBBBBB', size, size, 8, 3, 0, 0, 0)
+    palette = bytes(value for color in _PALETTE for value in color)
+
+    return _PNG_SIGNATURE + _chunk(b'IHDR', header) + \
+        _chunk(b'PLTE', palette) + \
+        _chunk(b'IDAT', zlib.compress(bytes(pixels), 9)) + \
+        _chunk(b'IEND', b'')
+
+
+@lru_cache(maxsize=_RENDER_CACHE)
+def render(lines, owners, rows=3, cols=3, size=WINDOW, image_format='png'):
+    """(int, bytes, int, int, int, str) -> bytes
+    Returns the image of the position <lines>, <owners> in <image_format>
+    ('png' or 'svg'), encoded. Recently rendered images are remembered
+    """
+    if image_format == 'svg':
+        return render_svg(lines, owners, rows, cols, size).encode()
+
+    if image_format == 'png':
+        return render_png(lines, owners, rows, cols, size)
+
+    raise ValueError('Unknown image format {0!r}'.format(image_format))
+
+
+##############################################################################
+# NOTE: Batch export
+#-----------------------------------------------------------------------------
+
+def game_positions(record, every_move=False):
+    """(GameRecord, bool) -> list
+    Returns the final position of the recorded game <record>, or with
+    <every_move> the position after each of its moves, starting with the
+    empty board
+    """
+    board = Board(record.rows, record.cols)
+    positions = [board_position(board)] if every_move else []
+
+    for line in record.moves:
+        board.add_line(line)
+        if every_move:
+            positions.append(board_position(board))
+
+    if not every_move:
+        positions.append(board_position(board))
+
+    return positions
+
+
+def _write_images(rows, cols, size, image_format, jobs):
+    """(int, int, int, str, list) -> int
+    Renders every position of <jobs>, a list of ((lines, owners), paths),
+    and writes it to each of its paths. Returns the number of files written
+    """
+    written = 0
+
+    for (lines, owners), paths in jobs:
+        image = render(lines, owners, rows, cols, size, image_format)
+        for path in paths:
+            with open(path, 'wb') as out:
+                out.write(image)
+        written += len(paths)
+
+    return written
+
+
+def export_games(games, directory, image_format='png', size=WINDOW,
+                 every_move=False, workers=None):
+    """(iterable, str, str, int, bool, int) -> tuple
+    Writes images of the recorded <games> (GameRecords, all of one board
+    size) to <directory>: game<id>.<format> for the final positions, or
+    game<id>_<move>.<format> for every position with <every_move>. Games
+    are numbered from 0 in the order given. Returns (files written,
+    positions rendered). Raises ValueError on a game of another board size
+    than the first
+    """
+    if image_format not in FORMATS:
+        raise ValueError('Unknown image format {0!r}'.format(image_format))
+
+    os.makedirs(directory, exist_ok=True)
+    paths = {}      # Position -> paths of the files showing it
+    rows = cols = None
+
+    for game, record in enumerate(games):
+        if rows is None:
+            rows, cols = record.rows, record.cols
+        elif (record.rows, record.cols) != (rows, cols):
+            raise ValueError('Game {0} is not on a {1}x{2} board'.format(
+                game, rows, cols))
+
+        for move, position in enumerate(game_positions(record, every_move)):
+            if every_move:
+                name = 'game{0}_{1:03}.{2}'.format(game, move, image_format)
+            else:
+                name = 'game{0}.{1}'.format(game, image_format)
+            paths.setdefault(position, []).append(
+                os.path.join(directory, name))
+
+    jobs = list(paths.items())
+    written = 0
+
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        chunks = [pool.submit(_write_images, rows, cols, size, image_format,
+                              jobs[start:start + CHUNK])
+                  for start in range(0, len(jobs), CHUNK)]
+
+        for chunk in chunks:
+            written += chunk.result()
+
+    return written, len(jobs)
+
+
+def _read_games(path):
+    """(str) -> list
+    Returns the GameRecords of the archive directory or record stream
+    <path>
+    """
+    if os.path.isdir(path):
+        with Archive(path, indexes=False) as archive:
+            return [archive.game(game) for game in range(len(archive))]
+
+    with open(path, 'rb') as stream:
+        return list(read_records(stream))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Write images of recorded games')
+    parser.add_argument('games',
+                        help='archive directory or game record stream')
+    parser.add_argument('directory', help='directory to write the images to')
+    parser.add_argument('--format', choices=FORMATS, default='png')
+    parser.add_argument('--size', type=int, default=WINDOW,
+                        help='width and height of the images in pixels')
+    parser.add_argument('--every-move', action='store_true',
+                        help='write the position after every move')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    arguments = parser.parse_args()
+
+    files, rendered = export_games(_read_games(arguments.games),
+                                   arguments.directory, arguments.format,
+                                   arguments.size, arguments.every_move,
+                                   arguments.workers)
+
+    print('Wrote {0} images of {1} positions to {2}'.format(
+        files, rendered, arguments.directory))
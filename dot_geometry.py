@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Screen geometry of the board
+
+Places a board of <rows> x <cols> dots in a window of <width> x <height>
+units, as the turtle front-end draws it: the dots sit on a square grid
+centred in the window, at least <margin> units from its sides, with the
+origin at the bottom left and the first row of dots at the top. The 3x3
+board in a 600 x 600 window has its dots at 100, 300 and 500 along both
+axes, 200 units apart.
+
+Every coordinate is computed once, when the Geometry is made, and stored in
+tuples indexed by the dot, line and square numbers of dot_nxm_logic. A
+point is resolved to the dot or the line under it by rounding its grid
+coordinates, so the cost of a click does not depend on the size of the
+board.
+"""
+from math import floor
+
+from dot_nxm_logic import line_count
+from dot_nxm_logic import line_dots
+from dot_nxm_logic import square_count
+
+
+def _number(value):
+    """(float) -> int or float
+    Returns <value> as an int if it is a whole number
+    """
+    return int(value) if float(value).is_integer() else value
+
+
+class Geometry:
+    """The coordinates of a board of <rows> x <cols> dots in a window of
+    <width> x <height> units:
+
+        spacing      - distance between neighbouring dots
+        dot_radius   - radius of a dot; a click within it selects the dot
+        mark_size    - half the width of a square owner's mark
+        dot_points   - (x, y) of every dot
+        line_points  - (x1, y1, x2, y2) of every line
+        square_points - (x, y) of the centre of every square
+    """
+    __slots__ = ('rows', 'cols', 'width', 'height', 'spacing', 'dot_radius',
+                 'mark_size', 'dot_points', 'line_points', 'square_points',
+                 '_left', '_top', '_pair_lines')
+
+    def __init__(self, rows=3, cols=3, width=600, height=600, margin=100,
+                 dot_radius=10):
+        self.rows = rows
+        self.cols = cols
+        self.width = width
+        self.height = height
+
+        spacing = min((width - 2 * margin) / max(cols - 1, 1),
+                      (height - 2 * margin) / max(rows - 1, 1))
+        self.spacing = _number(spacing)
+        self.dot_radius = _number(min(dot_radius, spacing / 4))
+        self.mark_size = _number(spacing / 5)
+
+        self._left = _number((width - (cols - 1) * spacing) / 2)
+        self._top = _number((height + (rows - 1) * spacing) / 2)
+
+        self.dot_points = tuple(
+            (_number(self._left + col * spacing),
+             _number(self._top - row * spacing))
+            for row in range(rows) for col in range(cols))
+
+        self.line_points = tuple(
+            self.dot_points[dot1] + self.dot_points[dot2]
+            for dot1, dot2 in (line_dots(rows, cols, line)
+                               for line in range(line_count(rows, cols))))
+
+        self.square_points = tuple(
+            (_number(self._left + (sq % (cols - 1) + 0.5) * spacing),
+             _number(self._top - (sq // (cols - 1) + 0.5) * spacing))
+            for sq in range(square_count(rows, cols)))
+
+        # The line joining every pair of neighbouring dots, in either order
+        self._pair_lines = {}
+        for line in range(len(self.line_points)):
+            dot1, dot2 = line_dots(rows, cols, line)
+            self._pair_lines[dot1, dot2] = self._pair_lines[dot2, dot1] = line
+
+    def _grid(self, x_pos, y_pos):
+        """(float, float) -> tuple
+        Returns the point (x_pos, y_pos) in grid units: (column, row)
+        """
+        return ((x_pos - self._left) / self.spacing,
+                (self._top - y_pos) / self.spacing)
+
+    def dot_at(self, x_pos, y_pos):
+        """(float, float) -> int or NoneType
+        Returns the dot that the point (x_pos, y_pos) is within, or None
+        """
+        col, row = self._grid(x_pos, y_pos)
+        col, row = round(col), round(row)
+
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+
+        dot = row * self.cols + col
+        dot_x, dot_y = self.dot_points[dot]
+
+        if abs(x_pos - dot_x) < self.dot_radius and \
+                abs(y_pos - dot_y) < self.dot_radius:
+            return dot
+
+        return None
+
+    def line_at(self, x_pos, y_pos, reach=None):
+        """(float, float, float) -> int or NoneType
+        Returns the line nearest to the point (x_pos, y_pos), or None if
+        none is within <reach> units (a quarter of the spacing by default).
+        Points beyond the outer dots of the board have no line
+        """
+        if reach is None:
+            reach = self.spacing / 4
+
+        col, row = self._grid(x_pos, y_pos)
+        best, distance = None, reach / self.spacing
+
+        # The nearest horizontal line lies on the nearest row, the nearest
+        # vertical one on the nearest column
+        near_row, near_col = round(row), round(col)
+        left_col, upper_row = floor(col), floor(row)
+
+        if 0 <= near_row < self.rows and 0 <= left_col < self.cols - 1 and \
+                abs(row - near_row) <= distance:
+            best = near_row * (self.cols - 1) + left_col
+            distance = abs(row - near_row)
+
+        if 0 <= near_col < self.cols and 0 <= upper_row < self.rows - 1 and \
+                abs(col - near_col) < distance:
+            best = self.rows * (self.cols - 1) + upper_row * self.cols + \
+                near_col
+
+        return best
+
+    def dots_line(self, dot1, dot2):
+        """(int, int) -> int or NoneType
+        Returns the line joining the dots <dot1> and <dot2>, or None if the
+        dots are not neighbours
+        """
+        return self._pair_lines.get((dot1, dot2))
+
+
+# Geometries by board size and window, made on first use
+_geometries = {}
+
+def geometry(rows=3, cols=3, width=600, height=600):
+    """(int, int, int, int) -> Geometry
+    Returns the geometry of a board of <rows> x <cols> dots in a window of
+    <width> x <height> units
+    """
+    found = _geometries.get((rows, cols, width, height))
+
+    if found is None:
+        found = _geometries[rows, cols, width, height] = \
+            Geometry(rows, cols, width, height)
+
+    return found
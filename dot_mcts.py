@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Computer player using Monte Carlo tree search
+
+Grows a search tree from the position given as the bitboard of its lines
+(see dot_nxm_logic for the line numbering), finishing the game with random
+lines from each new leaf (a rollout) and scoring 1 for a win, 1/2 for a
+draw and 0 for a loss. The move visited most often is played.
+
+With <workers> greater than one, every worker process grows its own tree
+from the same position (root parallelism) and the visit counts of the
+moves are added up. The workers share nothing while searching, so strength
+grows with the number of cores.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from math import log
+from math import sqrt
+from random import Random
+from time import perf_counter
+
+from dot_nxm_logic import bordering_masks
+from dot_nxm_logic import iter_lines
+from dot_nxm_logic import line_count
+
+# Exploration constant of the UCT formula
+EXPLORATION = 1.4
+
+# Rollouts between two readings of the clock
+_CLOCK_INTERVAL = 64
+
+
+class _Node:
+    """A position in the search tree.
+
+        lines    - bitboard of the position
+        root     - True if the player to move is the player searched for
+        untried  - free lines not yet expanded into children
+        children - {line: _Node}
+        visits   - number of rollouts through the node
+        wins     - total score of those rollouts for the player who moved
+                   into the node
+    """
+    __slots__ = ('lines', 'root', 'untried', 'children', 'visits', 'wins')
+
+    def __init__(self, lines, root, free, rng):
+        self.lines = lines
+        self.root = root
+        self.untried = free
+        rng.shuffle(self.untried)
+        self.children = {}
+        self.visits = 0
+        self.wins = 0.0
+
+
+def grow_tree(rows, cols, lines, margin, playouts, time_limit, seed):
+    """(int, int, int, int, int, float, int) -> tuple
+    Grows a search tree from position <lines> on a board of <rows> x <cols>
+    dots, where the player to move leads by <margin> squares. Stops after
+    <playouts> rollouts or <time_limit> seconds, whichever comes first (None
+    means no limit).
+    Returns ({line: (visits, wins)} for the moves of the root, rollouts)
+    """
+    rng = Random(seed)
+    full = (1 << line_count(rows, cols)) - 1
+    bordering = bordering_masks(rows, cols)
+
+    def gained(after, line):
+        count = 0
+        for mask in bordering[line]:
+            if after & mask == mask:
+                count += 1
+        return count
+
+    root = _Node(lines, True, list(iter_lines(full & ~lines)), rng)
+    deadline = None if time_limit is None else perf_counter() + time_limit
+    rollouts = 0
+
+    while playouts is None or rollouts < playouts:
+        if deadline is not None and not rollouts % _CLOCK_INTERVAL and \
+                perf_counter() > deadline:
+            break
+
+        node = root
+        path = [root]
+        score = margin  # Lead of the player searched for
+
+        # Selection - follow the best child while the node is fully expanded
+        while not node.untried and node.children:
+            log_visits = log(node.visits)
+            best, best_line, best_ucb = None, -1, -1.0
+
+            for line, child in node.children.items():
+                ucb = child.wins / child.visits + \
+                        EXPLORATION * sqrt(log_visits / child.visits)
+                if ucb > best_ucb:
+                    best, best_line, best_ucb = child, line, ucb
+
+            count = gained(best.lines, best_line)
+            score += count if node.root else -count
+            node = best
+            path.append(node)
+
+        # Expansion - add one untried move
+        if node.untried:
+            line = node.untried.pop()
+            after = node.lines | (1 << line)
+            count = gained(after, line)
+            score += count if node.root else -count
+            child = _Node(after, node.root if count else not node.root,
+                          list(iter_lines(full & ~after)), rng)
+            node.children[line] = child
+            node = child
+            path.append(node)
+
+        # Rollout - finish the game with random lines
+        mover = node.root
+        remaining = list(node.untried)
+        current = node.lines
+
+        for line in remaining:
+            current |= 1 << line
+            count = gained(current, line)
+            if count:
+                score += count if mover else -count
+            else:
+                mover = not mover
+
+        if score > 0:
+            result = 1.0
+        elif score < 0:
+            result = 0.0
+        else:
+            result = 0.5
+
+        # Backpropagation - credit each node to the player who moved into it
+        for index in range(1, len(path)):
+            parent, child = path[index - 1], path[index]
+            child.visits += 1
+            child.wins += result if parent.root else 1.0 - result
+        root.visits += 1
+
+        rollouts += 1
+
+    stats = {line: (child.visits, child.wins)
+             for line, child in root.children.items()}
+    return stats, rollouts
+
+
+class MCTSPlayer:
+    """Monte Carlo tree search player for a board of <rows> x <cols> dots.
+
+    Each move runs <playouts> rollouts, or runs for <time_limit> seconds,
+    whichever comes first; leave one of them None to use the other alone.
+    <workers> processes share the work. After each move <rollouts> and
+    <rollouts_per_second> report the work done.
+    """
+
+    def __init__(self, rows=3, cols=3, playouts=None, time_limit=1.0,
+                 workers=1, seed=None):
+        if playouts is None and time_limit is None:
+            raise ValueError('Give a number of playouts or a time limit')
+
+        self.rows = rows
+        self.cols = cols
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.workers = workers
+        self.rollouts = 0
+        self.rollouts_per_second = 0.0
+        self._rng = Random(seed)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def choose_move(self, lines, margin=0):
+        """(int, int) -> int or NoneType
+        Returns the line to add in position <lines>, where the player to
+        move leads by <margin> squares. Returns None if the board is full,
+        and a random free line if no rollout finished in time
+        """
+        full = (1 << line_count(self.rows, self.cols)) - 1
+
+        if not full & ~lines:
+            return None
+
+        start = perf_counter()
+        seeds = [self._rng.getrandbits(32) for _ in range(self.workers)]
+
+        if self.playouts is None:
+            playouts = None
+        else:
+            playouts = -(-self.playouts // self.workers)
+
+        if self.workers == 1:
+            results = [grow_tree(self.rows, self.cols, lines, margin,
+                                 playouts, self.time_limit, seeds[0])]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+
+            futures = [self._pool.submit(grow_tree, self.rows, self.cols,
+                                         lines, margin, playouts,
+                                         self.time_limit, seed)
+                       for seed in seeds]
+            results = [future.result() for future in futures]
+
+        # Add up the visits of the root moves over all trees
+        visits = {}
+        self.rollouts = 0
+
+        for stats, rollouts in results:
+            self.rollouts += rollouts
+            for line, (count, _) in stats.items():
+                visits[line] = visits.get(line, 0) + count
+
+        elapsed = perf_counter() - start
+        self.rollouts_per_second = self.rollouts / elapsed if elapsed else 0.0
+
+        if not visits:
+            # No rollout finished in time: play any free line
+            free = full & ~lines
+            return self._rng.choice([line for line in range(free.bit_length())
+                                     if free >> line & 1])
+
+        return max(visits, key=visits.get)
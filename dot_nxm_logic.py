@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""Game Engine for boards of any size
+
+Provides the same rules and operations as dot_3x3_logic for a playing
+surface of <rows> x <cols> dots. Lines and squares are identified by
+numbers instead of names. With R rows and C columns of dots, the R*(C-1)
+horizontal lines are numbered first, row by row, followed by the (R-1)*C
+vertical lines, also row by row. Squares are numbered row by row. For a
+board of 3x4 dots:
+
+        @--0--@--1--@--2--@
+        |     |     |     |
+        9  0  10 1  11 2  12
+        |     |     |     |
+        @--3--@--4--@--5--@
+        |     |     |     |
+        13 3  14 4  15 5  16
+        |     |     |     |
+        @--6--@--7--@--8--@
+
+Dots are numbered row by row as well, so the dot in row r and column c is
+the dot r * cols + c.
+
+On a 3x3 board the numbering matches dot_3x3_logic, and the line names
+('North_Northwest', ...) and square names ('top_left', ...) used there are
+accepted as aliases for the numbers.
+
+The state lives in flat bytearrays indexed arithmetically, so the cost of a
+move does not depend on the size of the board. As in dot_3x3_logic, moves
+can be taken back and redone in constant time, and the board keeps a Zobrist
+hash of its position up to date.
+"""
+import random
+
+from dot_3x3_logic import LINE_NAMES
+from dot_3x3_logic import SQUARE_NAMES
+# Sorts moves on a board of any size; lives in dot_3x3_logic, which builds
+# its tables with it, and is offered here beside bordering_masks
+from dot_3x3_logic import move_kinds  # noqa: F401
+
+# Players in turn order
+_PLAYERS = ('X', 'Y')
+
+# Turns the line buffer into binary digits
+_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+# Aliases used on a 3x3 board
+_LINE_ALIASES = {name: i for i, name in enumerate(LINE_NAMES)}
+_SQUARE_ALIASES = {name: i for i, name in enumerate(SQUARE_NAMES)}
+
+# Zobrist keys by board size, see zobrist_keys()
+_ZOBRIST = {}
+
+# Squares bordering every line and line masks of every square, by board
+# size, see _board_tables()
+_TABLES = {}
+
+
+def line_count(rows, cols):
+    """(int, int) -> int
+    Returns the number of lines on a board of <rows> x <cols> dots
+    """
+    return rows * (cols - 1) + (rows - 1) * cols
+
+
+def square_count(rows, cols):
+    """(int, int) -> int
+    Returns the number of squares on a board of <rows> x <cols> dots
+    """
+    return (rows - 1) * (cols - 1)
+
+
+def square_lines(rows, cols, sq):
+    """(int, int, int) -> tuple
+    Returns the four lines (top, bottom, left, right) around square <sq> on
+    a board of <rows> x <cols> dots
+    """
+    row, col = divmod(sq, cols - 1)
+    top = row * (cols - 1) + col
+    left = rows * (cols - 1) + row * cols + col
+    return top, top + cols - 1, left, left + 1
+
+
+def square_masks(rows, cols):
+    """(int, int) -> tuple
+    Returns, for every square on a board of <rows> x <cols> dots, a bitmask
+    of the four lines around it. A square is complete on a bitboard <lines>
+    when lines & mask == mask
+    """
+    return tuple(sum(1 << line for line in square_lines(rows, cols, sq))
+                 for sq in range(square_count(rows, cols)))
+
+
+def bordering_masks(rows, cols):
+    """(int, int) -> tuple
+    Returns, for every line on a board of <rows> x <cols> dots, the masks
+    (see square_masks) of the one or two squares bordering it
+    """
+    masks = square_masks(rows, cols)
+    return tuple(tuple(masks[sq] for sq in line_squares(rows, cols, line))
+                 for line in range(line_count(rows, cols)))
+
+
+def line_squares(rows, cols, line):
+    """(int, int, int) -> tuple
+    Returns the (one or two) squares bordering <line> on a board of
+    <rows> x <cols> dots
+    """
+    horizontal = rows * (cols - 1)
+
+    if line < horizontal:
+        row, col = divmod(line, cols - 1)
+        squares = ()
+        if row > 0:
+            squares += ((row - 1) * (cols - 1) + col,)
+        if row < rows - 1:
+            squares += (row * (cols - 1) + col,)
+        return squares
+
+    row, col = divmod(line - horizontal, cols)
+    squares = ()
+    if col > 0:
+        squares += (row * (cols - 1) + col - 1,)
+    if col < cols - 1:
+        squares += (row * (cols - 1) + col,)
+    return squares
+
+
+def zobrist_keys(rows, cols):
+    """(int, int) -> tuple
+    Returns the Zobrist keys of a board of <rows> x <cols> dots: (line keys,
+    (square keys of X, square keys of Y), key of player Y to move), 64-bit
+    ints drawn from a seed fixed by the board size. On a 3x3 board these are
+    the keys of dot_3x3_logic, so both engines hash positions alike
+    """
+    keys = _ZOBRIST.get((rows, cols))
+
+    if keys is None:
+        generator = random.Random('dots {0}x{1}'.format(rows, cols))
+        lines = tuple(generator.getrandbits(64)
+                      for _ in range(line_count(rows, cols)))
+        squares = tuple(tuple(generator.getrandbits(64)
+                              for _ in range(square_count(rows, cols)))
+                        for _ in _PLAYERS)
+        keys = _ZOBRIST[rows, cols] = (lines, squares,
+                                       generator.getrandbits(64))
+
+    return keys
+
+
+def iter_lines(mask):
+    """(int) -> generator
+    Yields the numbers of the lines in the bitmask <mask>, in increasing
+    order
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _board_tables(rows, cols):
+    """(int, int) -> tuple
+    Returns the squares bordering every line (see line_squares) and the
+    masks of every square (see square_masks) of a board of <rows> x <cols>
+    dots, computed once per size
+    """
+    tables = _TABLES.get((rows, cols))
+
+    if tables is None:
+        tables = _TABLES[rows, cols] = (
+            tuple(line_squares(rows, cols, line)
+                  for line in range(line_count(rows, cols))),
+            square_masks(rows, cols))
+
+    return tables
+
+
+def line_dots(rows, cols, line):
+    """(int, int, int) -> tuple
+    Returns the two dots joined by <line> on a board of <rows> x <cols> dots
+    """
+    horizontal = rows * (cols - 1)
+
+    if line < horizontal:
+        row, col = divmod(line, cols - 1)
+        dot = row * cols + col
+        return dot, dot + 1
+
+    dot = line - horizontal
+    return dot, dot + cols
+
+
+def dots_line(rows, cols, dot1, dot2):
+    """(int, int, int, int) -> int or NoneType
+    Returns the line joining the dots <dot1> and <dot2> on a board of
+    <rows> x <cols> dots, or None if the dots are not neighbours
+    """
+    if not (0 <= dot1 < rows * cols and 0 <= dot2 < rows * cols):
+        return None
+
+    dot1, dot2 = min(dot1, dot2), max(dot1, dot2)
+    row, col = divmod(dot1, cols)
+
+    if dot2 == dot1 + 1 and col < cols - 1:
+        return row * (cols - 1) + col
+
+    elif dot2 == dot1 + cols:
+        return rows * (cols - 1) + dot1
+
+    else:
+        return None
+
+
+class Board:
+    """The state of one connect the dots game on <rows> x <cols> dots.
+
+        edges  - one byte per line, 1 if the line exists
+        sides  - one byte per square, the number of its lines that exist
+        owners - one byte per square, 0 if nobody owns it, 1 for player X
+                 and 2 for player Y
+
+    The history holds one int per move, the line and the player who added
+    it; the squares it captured are the bordering squares left with four
+    sides.
+    """
+    __slots__ = ('rows', 'cols', '_edges', '_sides', '_owners', '_turn',
+                 '_x_count', '_y_count', '_keys', '_hash', '_history',
+                 '_redo', '_line_squares', '_square_masks')
+
+    def __init__(self, rows=3, cols=3):
+        if rows < 2 or cols < 2:
+            raise ValueError('A board needs at least 2x2 dots')
+
+        self.rows = rows
+        self.cols = cols
+        self._keys = zobrist_keys(rows, cols)
+        self._line_squares, self._square_masks = _board_tables(rows, cols)
+        self.reset()
+
+    def __repr__(self):
+        return 'Board(rows={0}, cols={1})'.format(self.rows, self.cols)
+
+    @property
+    def line_count(self):
+        """Number of lines on the board"""
+        return len(self._edges)
+
+    @property
+    def square_count(self):
+        """Number of squares on the board"""
+        return len(self._owners)
+
+    @property
+    def edges(self):
+        """Read-only view of the line buffer; 1 where a line exists"""
+        return memoryview(self._edges).toreadonly()
+
+    @property
+    def owners(self):
+        """Read-only view of the square owners; 0 for nobody, 1 for player X
+        and 2 for player Y"""
+        return memoryview(self._owners).toreadonly()
+
+    @property
+    def lines(self):
+        """Bitboard of the lines on the board; bit i is set if line i exists
+        """
+        return int(self._edges[::-1].translate(_DIGITS), 2)
+
+    @property
+    def zobrist(self):
+        """64-bit Zobrist hash of the lines, the square owners and the player
+        to move"""
+        return self._hash
+
+    def _line(self, line):
+        """(int or str) -> int or NoneType
+        Returns the number of <line>, translating a 3x3 line name.
+        Returns None if there is no such line
+        """
+        if isinstance(line, str):
+            if self.rows != 3 or self.cols != 3:
+                return None
+            return _LINE_ALIASES.get(line)
+
+        if 0 <= line < len(self._edges):
+            return line
+
+        return None
+
+    def _square(self, sq):
+        """(int or str) -> int or NoneType
+        Returns the number of square <sq>, translating a 3x3 square name.
+        Returns None if there is no such square
+        """
+        if isinstance(sq, str):
+            if self.rows != 3 or self.cols != 3:
+                return None
+            return _SQUARE_ALIASES.get(sq)
+
+        if 0 <= sq < len(self._owners):
+            return sq
+
+        return None
+
+    def add_line(self, line):
+        """(int or str) -> bool
+        Attempts to add the line <line> between two dots.
+
+        If the line is not present, adds the line and returns True. When the
+        line completes one or two squares, the current player captures them
+        and moves again, otherwise control passes to the other player.
+        If the line is already present, or there is no such line, no change
+        to state of game board and returns False
+        """
+        line = self._line(line)
+
+        if line is None or self._edges[line]:
+            return False
+
+        self._play(line)
+
+        # Adding the next undone line keeps the rest of the redo stack;
+        # any other line abandons it
+        redo = self._redo
+        if redo:
+            if redo[-1] == line:
+                redo.pop()
+            else:
+                redo.clear()
+
+        return True
+
+    def _play(self, line):
+        """(int) -> NoneType
+        Adds the absent line <line> and records the move in the history
+        """
+        self._edges[line] = 1
+
+        line_keys, square_keys, turn_key = self._keys
+        turn = self._turn
+        sides = self._sides
+        owners = self._owners
+        captured = 0
+        key = line_keys[line]
+
+        for sq in self._line_squares[line]:
+            sides[sq] += 1
+            if sides[sq] == 4:
+                owners[sq] = turn + 1
+                key ^= square_keys[turn][sq]
+                captured += 1
+
+        if not captured:
+            self._turn ^= 1
+            key ^= turn_key
+        elif turn:
+            self._y_count += captured
+        else:
+            self._x_count += captured
+
+        self._hash ^= key
+        self._history.append(line << 1 | turn)
+
+    def undo_line(self):
+        """() -> int or NoneType
+        Takes back the last line added, restoring the owners of the squares
+        it completed and the player to move.
+        Returns the line removed, or None if no line was added
+        """
+        if not self._history:
+            return None
+
+        move = self._history.pop()
+        line, turn = move >> 1, move & 1
+        line_keys, square_keys, turn_key = self._keys
+        sides = self._sides
+        owners = self._owners
+        captured = 0
+        key = line_keys[line]
+
+        for sq in self._line_squares[line]:
+            if sides[sq] == 4:
+                owners[sq] = 0
+                key ^= square_keys[turn][sq]
+                captured += 1
+            sides[sq] -= 1
+
+        if not captured:
+            key ^= turn_key
+        elif turn:
+            self._y_count -= captured
+        else:
+            self._x_count -= captured
+
+        self._edges[line] = 0
+        self._hash ^= key
+        self._turn = turn
+        self._redo.append(line)
+        return line
+
+    def redo_line(self):
+        """() -> int or NoneType
+        Adds back the line last taken back by undo_line().
+        Returns the line added, or None if there is nothing to redo
+        """
+        if not self._redo:
+            return None
+
+        line = self._redo.pop()
+        self._play(line)
+        return line
+
+    def legal_moves(self):
+        """() -> int
+        Returns the bitmask of the lines that can still be added; bit i is
+        set if line i is free
+        """
+        return ((1 << len(self._edges)) - 1) ^ self.lines
+
+    def _squares_with(self, count):
+        """(int) -> generator
+        Yields the squares that have <count> of their lines
+        """
+        sides = self._sides
+        sq = sides.find(count)
+
+        while sq >= 0:
+            yield sq
+            sq = sides.find(count, sq + 1)
+
+    def capturing_moves(self):
+        """() -> int
+        Returns the bitmask of the free lines that complete a square
+        """
+        masks = self._square_masks
+        three_sided = 0
+
+        for sq in self._squares_with(3):
+            three_sided |= masks[sq]
+
+        return three_sided & ~self.lines
+
+    def safe_moves(self):
+        """() -> int
+        Returns the bitmask of the free lines that neither complete a square
+        nor give one away, i.e. leave no bordering square with three lines
+        """
+        masks = self._square_masks
+        unsafe = 0
+
+        for count in (2, 3):
+            for sq in self._squares_with(count):
+                unsafe |= masks[sq]
+
+        return self.legal_moves() & ~unsafe
+
+    def line_indexes(self, mask=None):
+        """(int) -> generator
+        Yields the numbers of the lines in the bitmask <mask>, by default the
+        legal moves, in increasing order
+        """
+        return iter_lines(self.legal_moves() if mask is None else mask)
+
+    def check_line(self, line):
+        """(int or str) -> bool
+        Returns True if the line <line> exists on the game board, otherwise
+        False
+        """
+        line = self._line(line)
+        return line is not None and self._edges[line] == 1
+
+    def square_owner(self, sq):
+        """(int or str) -> str or NoneType
+        Returns the player who owns the square <sq>, and None if no-one
+        owns it
+        """
+        sq = self._square(sq)
+
+        if sq is None or not self._owners[sq]:
+            return None
+
+        return _PLAYERS[self._owners[sq] - 1]
+
+    def score(self):
+        """() -> tuple
+        Returns the number of squares owned by player X and by player Y
+        """
+        return self._x_count, self._y_count
+
+    def winner(self):
+        """() -> str or NoneType
+        Returns 'X' or 'Y', or 'Draw' if every square is owned and both
+        players own the same number of squares.
+        Returns None if open squares still exist, and so the game can continue
+        """
+        x_count, y_count = self._x_count, self._y_count
+
+        if x_count + y_count < len(self._owners):
+            return None
+
+        elif x_count > y_count:
+            return 'X'
+
+        elif x_count < y_count:
+            return 'Y'
+
+        else:
+            return 'Draw'
+
+    def current_player(self):
+        """() -> str
+        Returns the player whose turn it is to move
+        """
+        return _PLAYERS[self._turn]
+
+    def reset(self):
+        """
+        Makes the playing board ready for a new game; clears all the lines
+        and squares and sets the current player to X
+        """
+        squares = square_count(self.rows, self.cols)
+        self._edges = bytearray(line_count(self.rows, self.cols))
+        self._sides = bytearray(squares)
+        self._owners = bytearray(squares)
+        self._turn = 0
+        self._x_count = self._y_count = 0
+        self._hash = 0
+        self._history = []
+        self._redo = []
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Compact binary game records
+
+A record stream is the magic b'DOTR' and a format version byte, followed by
+one frame per game:
+
+    rows      1 byte   rows of dots
+    cols      1 byte   columns of dots
+    result    1 byte   0 unfinished, 1 player X won, 2 player Y won, 3 draw
+    x_score   varint   squares owned by player X
+    y_score   varint   squares owned by player Y
+    count     varint   number of moves
+    moves              the lines added, in order (see dot_nxm_logic for the
+                       line numbering): two moves per byte, low nibble
+                       first, if the board has at most 16 lines, otherwise
+                       one varint per move
+
+A varint holds 7 bits per byte, least significant first, with the top bit
+set on every byte but the last. A complete 3x3 game takes 12 bytes.
+
+Games are numbered by their position in the stream, starting at 0. Streams
+can be concatenated by appending frames to an existing stream.
+"""
+from collections import namedtuple
+
+from dot_nxm_logic import Board
+from dot_nxm_logic import line_count
+
+MAGIC = b'DOTR'
+VERSION = 1
+
+# Result byte of each winner() value
+RESULT_CODES = {None: 0, 'X': 1, 'Y': 2, 'Draw': 3}
+RESULTS = (None, 'X', 'Y', 'Draw')
+
+# Bytes read from a stream at a time
+_CHUNK = 1 << 16
+
+GameRecord = namedtuple('GameRecord',
+                        'rows cols result x_score y_score moves')
+GameRecord.__doc__ = """One recorded game. <result> is a winner() value and
+<moves> a tuple of line numbers"""
+
+
+def make_record(moves, rows=3, cols=3):
+    """(iterable, int, int) -> GameRecord
+    Replays <moves> on a board of <rows> x <cols> dots and returns the
+    record of the game. Raises ValueError on an illegal move
+    """
+    board = Board(rows, cols)
+    moves = tuple(moves)
+
+    for line in moves:
+        if not board.add_line(line):
+            raise ValueError('Illegal move {0!r}'.format(line))
+
+    x_score, y_score = board.score()
+    return GameRecord(rows, cols, board.winner(), x_score, y_score, moves)
+
+
+def _varint(value, out):
+    """(int, bytearray) -> NoneType
+    Appends <value> to <out> as a varint
+    """
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode(record):
+    """(GameRecord) -> bytearray
+    Returns the frame of <record>
+    """
+    out = bytearray((record.rows, record.cols, RESULT_CODES[record.result]))
+    _varint(record.x_score, out)
+    _varint(record.y_score, out)
+    _varint(len(record.moves), out)
+
+    moves = record.moves
+
+    if line_count(record.rows, record.cols) <= 16:
+        for index in range(0, len(moves) - 1, 2):
+            out.append(moves[index] | moves[index + 1] << 4)
+        if len(moves) % 2:
+            out.append(moves[-1])
+    else:
+        for line in moves:
+            _varint(line, out)
+
+    return out
+
+
+class RecordWriter:
+    """Writes game records to the binary file <stream>, starting the stream
+    with its header unless the file already holds data
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.count = 0  # Games written by this writer
+
+        if stream.tell() == 0:
+            stream.write(MAGIC + bytes((VERSION,)))
+
+    def write(self, record):
+        """(GameRecord) -> NoneType
+        Appends <record> to the stream
+        """
+        self._stream.write(encode(record))
+        self.count += 1
+
+    def write_game(self, moves, rows=3, cols=3):
+        """(iterable, int, int) -> GameRecord
+        Replays <moves> on a board of <rows> x <cols> dots, appends the
+        record of the game to the stream and returns it
+        """
+        record = make_record(moves, rows, cols)
+        self.write(record)
+        return record
+
+
+class _Buffer:
+    """Reads a binary file in chunks"""
+    __slots__ = ('_stream', '_data', '_position')
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._data = b''
+        self._position = 0
+
+    def at_end(self):
+        """() -> bool
+        Returns True if the stream has no more data
+        """
+        if self._position < len(self._data):
+            return False
+        self._data = self._stream.read(_CHUNK)
+        self._position = 0
+        return not self._data
+
+    def take(self, size):
+        """(int) -> bytes
+        Returns the next <size> bytes. Raises ValueError if the stream ends
+        first
+        """
+        end = self._position + size
+
+        if end > len(self._data):
+            self._data = self._data[self._position:] + \
+                    self._stream.read(max(_CHUNK, size))
+            self._position, end = 0, size
+
+            if end > len(self._data):
+                raise ValueError('Record stream ends inside a game')
+
+        piece = self._data[self._position:end]
+        self._position = end
+        return piece
+
+    def varint(self):
+        """() -> int
+        Returns the next varint
+        """
+        value = shift = 0
+
+        while True:
+            byte = self.take(1)[0]
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+
+def read_records(stream):
+    """(file) -> generator
+    Yields the GameRecord of every game in the binary file <stream>, one
+    game at a time. Raises ValueError if <stream> is not a record stream
+    """
+    buffer = _Buffer(stream)
+
+    if buffer.at_end() or buffer.take(len(MAGIC) + 1) != \
+            MAGIC + bytes((VERSION,)):
+        raise ValueError('Not a game record stream')
+
+    game = 0    # Number of the game being read
+
+    while not buffer.at_end():
+        rows, cols, result = buffer.take(3)
+
+        if result >= len(RESULTS):
+            raise ValueError('Game {0} has the unknown result {1}'.format(
+                game, result))
+
+        x_score = buffer.varint()
+        y_score = buffer.varint()
+        count = buffer.varint()
+
+        if line_count(rows, cols) <= 16:
+            packed = buffer.take((count + 1) // 2)
+            moves = []
+            for byte in packed:
+                moves.append(byte & 0xF)
+                moves.append(byte >> 4)
+            moves = tuple(moves[:count])
+        else:
+            moves = tuple(buffer.varint() for _ in range(count))
+
+        yield GameRecord(rows, cols, RESULTS[result], x_score, y_score,
+                         moves)
+        game += 1
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""Game server for text-mode sessions
+
+Serves the game of dot_3x3_textmode over TCP, so it can be played with any
+line-based client (e.g. telnet or nc). Each new connection waits in the
+lobby until a second one arrives; the pair then plays a game on its own
+GameState, the first connection as player X. Moves use the protocol of
+dot_3x3_textmode: two dots such as '01', or 'Q' to quit, and the board is
+drawn by dot_3x3_textmode.draw_game after every accepted move.
+
+A single process can hold many thousands of connections, most of them idle:
+    - a connection that does not move within <idle_timeout> seconds when it
+      is its turn loses its game and is closed (as does one that goes away
+      in the middle of a game),
+    - a connection that does not take its output within <write_timeout>
+      seconds (a full send buffer) is closed, so a slow client never holds
+      up the others, and
+    - input is read with a small buffer; a client that sends faster than the
+      game reads stops being read until the game catches up.
+Anything a client sends while it waits in the lobby is ignored, except
+'WATCH <game>', which turns the connection into a spectator of game number
+<game>: it then receives the game as the binary messages of dot_spectate.
+
+Usage:
+    python3 dot_server.py [--host HOST] [--port PORT]
+"""
+import argparse
+import asyncio
+
+from dot_3x3_logic import GameState
+from dot_3x3_logic import LINE_NAMES
+from dot_3x3_textmode import make_line
+from dot_3x3_textmode import render_board
+from dot_spectate import Channel
+from dot_spectate import stream
+
+# Longest line a client may send
+_LINE_LIMIT = 256
+
+# Send buffer size above which a connection must wait for its client
+_WRITE_HIGH_WATER = 16 * 1024
+
+
+class _Disconnected(Exception):
+    """Raised when a client goes away, times out or misbehaves"""
+
+
+class Connection:
+    """One client of the server"""
+    __slots__ = ('reader', 'writer', 'finished', 'lobby', '_write_timeout')
+
+    def __init__(self, reader, writer, write_timeout):
+        self.reader = reader
+        self.writer = writer
+        self.finished = asyncio.get_running_loop().create_future()
+        self.lobby = None   # Task watching the client while it waits
+        self._write_timeout = write_timeout
+        writer.transport.set_write_buffer_limits(high=_WRITE_HIGH_WATER)
+
+    def closed(self):
+        """() -> bool
+        Returns True if the client has gone away
+        """
+        return self.writer.is_closing() or self.reader.at_eof()
+
+    async def send(self, text):
+        """(str) -> NoneType
+        Sends <text> to the client, waiting while its send buffer is full.
+        Raises _Disconnected if the client is gone or too slow
+        """
+        if self.writer.is_closing():
+            raise _Disconnected()
+
+        self.writer.write(text.encode())
+
+        try:
+            await asyncio.wait_for(self.writer.drain(), self._write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            raise _Disconnected()
+
+    async def receive(self, timeout):
+        """(float) -> str
+        Returns the next line from the client, without its line break.
+        Raises _Disconnected if the client is gone, sends nothing for
+        <timeout> seconds or sends an overlong line
+        """
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), timeout)
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            raise _Disconnected()
+
+        if not line:
+            raise _Disconnected()
+
+        return line.decode(errors='replace').strip()
+
+    async def close(self):
+        """
+        Closes the connection
+        """
+        self.writer.close()
+
+        try:
+            await asyncio.wait_for(self.writer.wait_closed(),
+                                   self._write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+
+def board_text(game):
+    """(GameState) -> str
+    Returns the board of <game> as drawn by dot_3x3_textmode.draw_game
+    """
+    return render_board(game.lines, game.owners)
+
+
+class GameServer:
+    """Pairs connections on <host>:<port> into games.
+    <games> counts the games started, <connections> the open connections and
+    <channels> holds the spectator channel of each game in progress
+    """
+
+    def __init__(self, host='localhost', port=8023, idle_timeout=300.0,
+                 write_timeout=10.0):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.write_timeout = write_timeout
+        self.games = 0
+        self.connections = 0
+        self.channels = {}
+        self._waiting = None    # Connection in the lobby
+        self._server = None
+
+    async def start(self):
+        """
+        Starts accepting connections. With port 0, <port> is set to the
+        port chosen by the operating system
+        """
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=_LINE_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Starts the server, if necessary, and serves until cancelled
+        """
+        if self._server is None:
+            await self.start()
+
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops accepting connections
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        """
+        Serves one connection, from the lobby to the end of its game
+        """
+        connection = Connection(reader, writer, self.write_timeout)
+        self.connections += 1
+
+        try:
+            await connection.send('Connect the dots (3x3)\n')
+
+            opponent = self._waiting
+
+            if opponent is None or opponent.closed():
+                # Wait in the lobby; the opponent's handler plays the game
+                self._waiting = connection
+                connection.lobby = asyncio.ensure_future(
+                    self._lobby(connection))
+                await connection.send('Waiting for an opponent\n')
+                await asyncio.wait((connection.finished, connection.lobby),
+                                   return_when=asyncio.FIRST_COMPLETED)
+
+                # The lobby task is cancelled when an opponent arrives, and
+                # ends by itself when the client leaves or starts watching
+                if connection.lobby.cancelled():
+                    await connection.finished
+                elif connection.lobby.result() is not None:
+                    await self._watch(connection, connection.lobby.result())
+            else:
+                self._waiting = None
+                self.games += 1
+
+                # Stop watching the opponent before the game reads from it
+                opponent.lobby.cancel()
+                try:
+                    await opponent.lobby
+                except asyncio.CancelledError:
+                    pass
+
+                try:
+                    await self._play(opponent, connection, self.games)
+                finally:
+                    if not opponent.finished.done():
+                        opponent.finished.set_result(None)
+                    await opponent.close()
+        except _Disconnected:
+            pass
+        finally:
+            if self._waiting is connection:
+                self._waiting = None
+            self.connections -= 1
+            await connection.close()
+
+    async def _lobby(self, connection):
+        """
+        Reads and ignores what the client sends while it waits for an
+        opponent. Returns the game number if the client asks to watch a
+        game, or None when the client leaves or misbehaves. Either way the
+        client leaves the lobby at once, so no opponent is paired with it
+        """
+        try:
+            while True:
+                line = await connection.reader.readline()
+                if not line:
+                    return None
+
+                words = line.decode(errors='replace').split()
+                if len(words) == 2 and words[0].upper() == 'WATCH' and \
+                        words[1].isdigit():
+                    return int(words[1])
+        except (ValueError, ConnectionError):
+            return None
+        finally:
+            if self._waiting is connection:
+                self._waiting = None
+
+    async def _watch(self, connection, game_number):
+        """
+        Streams game number <game_number> to a spectator
+        """
+        channel = self.channels.get(game_number)
+
+        if channel is None:
+            await connection.send('No game {0}\n'.format(game_number))
+            return
+
+        await connection.send('Watching game {0}\n'.format(game_number))
+        await stream(channel.subscribe(), connection.writer,
+                     self.write_timeout)
+
+    async def _broadcast(self, players, text):
+        """
+        Sends <text> to both <players>, ignoring one that has gone
+        """
+        for connection in players.values():
+            try:
+                await connection.send(text)
+            except _Disconnected:
+                pass
+
+    async def _play(self, x_connection, y_connection, game_number):
+        """
+        Plays game number <game_number> between the two connections
+        """
+        channel = self.channels[game_number] = Channel()
+
+        try:
+            await self._play_game(x_connection, y_connection, game_number,
+                                  channel)
+        finally:
+            channel.close()
+            del self.channels[game_number]
+
+    async def _play_game(self, x_connection, y_connection, game_number,
+                         channel):
+        """
+        Plays a game between the two connections, publishing its lines to
+        <channel>
+        """
+        players = {'X': x_connection, 'Y': y_connection}
+        game = GameState()
+
+        for player, connection in players.items():
+            await connection.send('Game {0}: you are player {1}\n\n'.format(
+                game_number, player))
+
+        await self._broadcast(players, board_text(game))
+        winning_player = None
+
+        while not winning_player:
+            player = game.current_player()
+            mover = players[player]
+
+            try:
+                await mover.send('Move for player {0} : '.format(player))
+                move = await mover.receive(self.idle_timeout)
+            except _Disconnected:
+                # Leaving or timing out forfeits the game to the opponent
+                await self._broadcast(players,
+                                      '\nPlayer {0} left\n'.format(player))
+                winning_player = 'Y' if player == 'X' else 'X'
+                break
+
+            if move == 'Q' or move == 'q':
+                await self._broadcast(players,
+                                      '\nPlayer {0} quit\n'.format(player))
+                break
+
+            new_line = make_line(move)
+
+            if new_line != 'No line' and game.add_line(new_line):
+                channel.publish(LINE_NAMES.index(new_line))
+                await self._broadcast(players, '\n' + board_text(game))
+            else:
+                await mover.send('\nConnection not possible\n')
+
+            winning_player = game.winner()
+
+        if winning_player == 'X':
+            result = 'X won'
+        elif winning_player == 'Y':
+            result = 'Y won'
+        elif winning_player == 'Draw':
+            result = 'Draw'
+        else:
+            result = 'No result'
+
+        await self._broadcast(players,
+                              '{0}\n\n**** GAME OVER ****\n'.format(result))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serve connect the dots games over TCP')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8023)
+    parser.add_argument('--idle-timeout', type=float, default=300.0,
+                        help='seconds a player may take over a move')
+    arguments = parser.parse_args()
+
+    server = GameServer(arguments.host, arguments.port,
+                        arguments.idle_timeout)
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Spectators for games in progress
+
+A Channel carries one game to any number of spectators. Every accepted
+line is published once as a small delta message, encoded once and shared by
+all subscribers:
+
+    b'D'  seq (uint32)  line (uint16)  flags (uint8)  square (uint16) ...
+
+where the low two bits of flags count the squares the line captured (their
+numbers follow), and bit 2 is set if player Y moves next. A snapshot carries
+the whole game:
+
+    b'S'  seq (uint32)  rows (uint8)  cols (uint8)  turn (uint8)
+          owners (one byte per square: 0 none, 1 X, 2 Y)
+          lines (bitboard, little-endian, (line count + 7) // 8 bytes)
+
+<seq> counts the lines published so far. A snapshot already includes the
+delta with its own <seq>, so a spectator applies only the deltas after the
+snapshot with a higher <seq>.
+
+Each subscriber has a bounded queue. A subscriber that falls so far behind
+that its queue overflows loses its queued deltas and gets a fresh snapshot
+instead. A late joiner starts with the latest snapshot and the deltas
+published since it was taken. All numbers are little-endian; lines and
+squares are numbered as in dot_nxm_logic.
+"""
+import asyncio
+import struct
+from collections import deque
+
+from dot_nxm_logic import Board
+from dot_nxm_logic import line_squares
+
+# Messages a subscriber may have queued before it must resynchronise
+QUEUE_SIZE = 64
+
+# Deltas between two snapshots kept for late joiners
+SNAPSHOT_INTERVAL = 16
+
+_DELTA = struct.Struct('<cIHB')
+_SNAPSHOT = struct.Struct('<cIBBB')
+_SQUARE = struct.Struct('<H')
+_FRAME = struct.Struct('<H')
+
+
+def decode(message):
+    """(bytes) -> tuple
+    Decodes a message:
+        ('D', seq, line, captured squares, next player) for a delta, or
+        ('S', seq, rows, cols, next player, owners, lines) for a snapshot
+    """
+    if message[:1] == b'D':
+        _, seq, line, flags = _DELTA.unpack_from(message)
+        squares = tuple(_SQUARE.unpack_from(message, _DELTA.size + 2 * i)[0]
+                        for i in range(flags & 3))
+        return ('D', seq, line, squares, 'Y' if flags & 4 else 'X')
+
+    _, seq, rows, cols, turn = _SNAPSHOT.unpack_from(message)
+    squares = (rows - 1) * (cols - 1)
+    owners = message[_SNAPSHOT.size:_SNAPSHOT.size + squares]
+    lines = int.from_bytes(message[_SNAPSHOT.size + squares:], 'little')
+    return ('S', seq, rows, cols, 'XY'[turn], bytes(owners), lines)
+
+
+class Subscriber:
+    """A spectator's queue of messages"""
+    __slots__ = ('_channel', '_queue', '_ready', '_ended', 'resyncs')
+
+    def __init__(self, channel):
+        self._channel = channel
+        self._queue = deque()
+        self._ready = None      # asyncio.Event, made on first wait
+        self._ended = False     # True once the game is over
+        self.resyncs = 0        # Times the subscriber fell behind
+
+    def _push(self, message):
+        """
+        Queues <message>, replacing the queue by a snapshot on overflow
+        """
+        queue = self._queue
+
+        if len(queue) >= QUEUE_SIZE:
+            queue.clear()
+            queue.append(self._channel.current_snapshot())
+            self.resyncs += 1
+        else:
+            queue.append(message)
+
+        if self._ready is not None:
+            self._ready.set()
+
+    def pending(self):
+        """() -> list
+        Returns and removes the queued messages
+        """
+        messages = list(self._queue)
+        self._queue.clear()
+        return messages
+
+    def _end(self):
+        """
+        Marks the end of the game
+        """
+        self._ended = True
+
+        if self._ready is not None:
+            self._ready.set()
+
+    async def get(self):
+        """() -> bytes or NoneType
+        Returns the next message, waiting for one if necessary. Returns
+        None once the game is over and every message has been taken
+        """
+        while not self._queue:
+            if self._ended:
+                return None
+            if self._ready is None:
+                self._ready = asyncio.Event()
+            self._ready.clear()
+            await self._ready.wait()
+
+        return self._queue.popleft()
+
+    def close(self):
+        """
+        Stops receiving messages
+        """
+        self._channel.unsubscribe(self)
+
+
+class Channel:
+    """Carries a game on a board of <rows> x <cols> dots to its spectators
+    """
+
+    def __init__(self, rows=3, cols=3):
+        self.rows = rows
+        self.cols = cols
+        self.seq = 0
+        self._board = Board(rows, cols)
+        self._subscribers = set()
+        self._snapshot = self.snapshot()
+        self._tail = []     # Deltas published since _snapshot
+        self._current = self._snapshot  # Snapshot at seq, made on demand
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def snapshot(self):
+        """() -> bytes
+        Returns a snapshot of the game as it stands
+        """
+        board = self._board
+        turn = 0 if board.current_player() == 'X' else 1
+        owners = bytes(0 if owner is None else 1 if owner == 'X' else 2
+                       for owner in map(board.square_owner,
+                                        range(board.square_count)))
+        lines = board.lines.to_bytes((board.line_count + 7) // 8, 'little')
+        return _SNAPSHOT.pack(b'S', self.seq, self.rows, self.cols, turn) + \
+            owners + lines
+
+    def current_snapshot(self):
+        """() -> bytes
+        Returns a snapshot of the game as it stands, encoding it at most
+        once per line published
+        """
+        if _SNAPSHOT.unpack_from(self._current)[1] != self.seq:
+            self._current = self.snapshot()
+
+        return self._current
+
+    def publish(self, line):
+        """(int) -> bytes
+        Adds <line> to the game and sends the delta to every subscriber.
+        Returns the delta, or None if the line could not be added
+        """
+        board = self._board
+
+        if not board.add_line(line):
+            return None
+
+        # A square bordering the new line that is owned now was completed
+        # by it
+        self.seq += 1
+        captured = [sq for sq in line_squares(self.rows, self.cols, line)
+                    if board.square_owner(sq) is not None]
+        flags = len(captured) | (4 if board.current_player() == 'Y' else 0)
+
+        delta = _DELTA.pack(b'D', self.seq, line, flags) + \
+            b''.join(_SQUARE.pack(sq) for sq in captured)
+
+        if len(self._tail) >= SNAPSHOT_INTERVAL:
+            self._snapshot = self.current_snapshot()
+            self._tail = []
+        else:
+            self._tail.append(delta)
+
+        for subscriber in self._subscribers:
+            subscriber._push(delta)
+
+        return delta
+
+    def subscribe(self):
+        """() -> Subscriber
+        Returns a new subscriber, primed with the latest snapshot and the
+        deltas published since
+        """
+        subscriber = Subscriber(self)
+        subscriber._queue.append(self._snapshot)
+        subscriber._queue.extend(self._tail)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def close(self):
+        """
+        Ends the game for every subscriber; they receive the messages still
+        queued and then None
+        """
+        for subscriber in self._subscribers:
+            subscriber._end()
+        self._subscribers.clear()
+
+    def unsubscribe(self, subscriber):
+        """(Subscriber) -> NoneType
+        Stops sending messages to <subscriber>
+        """
+        self._subscribers.discard(subscriber)
+
+
+async def stream(subscriber, writer, timeout=10.0):
+    """(Subscriber, asyncio.StreamWriter, float) -> NoneType
+    Writes the messages of <subscriber> to <writer>, each preceded by its
+    length (uint16), until the game is over, the connection fails or it
+    cannot take a message within <timeout> seconds. While the connection
+    is slow, messages pile up in the subscriber's queue until it
+    resynchronises
+    """
+    try:
+        while True:
+            message = await subscriber.get()
+            if message is None:
+                break
+            writer.write(_FRAME.pack(len(message)) + message)
+            await asyncio.wait_for(writer.drain(), timeout)
+    except (ConnectionError, asyncio.TimeoutError):
+        pass
+    finally:
+        subscriber.close()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Symmetries of the board
+
+Rotating or mirroring the board does not change the game: the position
+reached by transforming every line has the same value, and its best move is
+the transformed best move. A square board has eight such symmetries, a
+rectangular one four (the turns by 90 degrees and the diagonal mirrors would
+change its shape). Transforms are numbered:
+
+    0 identity        (r, c) -> (r, c)
+    1 mirror          (r, c) -> (r, C-1-c)      left and right swapped
+    2 flip            (r, c) -> (R-1-r, c)      top and bottom swapped
+    3 rotate 180      (r, c) -> (R-1-r, C-1-c)
+    4 transpose       (r, c) -> (c, r)          square boards only
+    5 rotate 90       (r, c) -> (c, R-1-r)      clockwise
+    6 rotate 270      (r, c) -> (C-1-c, r)
+    7 anti-transpose  (r, c) -> (C-1-c, R-1-r)
+
+where (r, c) is the dot in row r and column c of R x C dots. A transform
+maps lines to lines; on the 3x3 board, mirroring maps 'North_Northwest' to
+'North_Northeast' and transposing maps it to 'West_Northwest'.
+
+The canonical form of a position (a bitboard of lines) is the smallest
+bitboard among its transforms. Tables keyed by canonical positions hold one
+entry for up to eight positions; a best move found for the canonical
+position is mapped back to the position played with restore_line().
+"""
+from array import array
+
+from dot_nxm_logic import dots_line
+from dot_nxm_logic import line_count
+from dot_nxm_logic import line_dots
+
+TRANSFORM_NAMES = ('identity', 'mirror', 'flip', 'rotate 180', 'transpose',
+                   'rotate 90', 'rotate 270', 'anti-transpose')
+
+# Dot maps of the transforms: (r, c, R, C) -> (r', c')
+_DOT_MAPS = (lambda r, c, R, C: (r, c),
+             lambda r, c, R, C: (r, C - 1 - c),
+             lambda r, c, R, C: (R - 1 - r, c),
+             lambda r, c, R, C: (R - 1 - r, C - 1 - c),
+             lambda r, c, R, C: (c, r),
+             lambda r, c, R, C: (c, R - 1 - r),
+             lambda r, c, R, C: (C - 1 - c, r),
+             lambda r, c, R, C: (C - 1 - c, R - 1 - r))
+
+# Boards with at most this many lines keep the canonical form of every
+# position in a table
+_TABLE_LINES = 16
+
+# Bits of a bitboard transformed by one table lookup
+_CHUNK = 8
+_CHUNK_MASK = (1 << _CHUNK) - 1
+
+
+class Symmetry:
+    """The symmetries of a board of <rows> x <cols> dots.
+
+        permutations - for every transform, the line each line maps to
+        inverses     - for every transform, the transform that undoes it
+    """
+    __slots__ = ('rows', 'cols', 'permutations', 'inverses', '_chunks',
+                 '_keys', '_transforms')
+
+    def __init__(self, rows=3, cols=3):
+        self.rows = rows
+        self.cols = cols
+        lines = line_count(rows, cols)
+        count = 8 if rows == cols else 4
+
+        self.permutations = tuple(
+            tuple(self._map_line(dot_map, line) for line in range(lines))
+            for dot_map in _DOT_MAPS[:count])
+
+        identity = self.permutations[0]
+        self.inverses = tuple(
+            next(u for u, other in enumerate(self.permutations)
+                 if tuple(other[line] for line in perm) == identity)
+            for perm in self.permutations)
+
+        # For every transform and every chunk of _CHUNK lines, the image of
+        # each of the 2 ** _CHUNK ways of setting them
+        self._chunks = tuple(
+            tuple(self._chunk_table(perm, start)
+                  for start in range(0, lines, _CHUNK))
+            for perm in self.permutations)
+
+        self._keys = self._transforms = None
+
+        if lines <= _TABLE_LINES:
+            self._keys, self._transforms = self._canonical_table(lines)
+
+    def __len__(self):
+        return len(self.permutations)
+
+    def _map_line(self, dot_map, line):
+        """(callable, int) -> int
+        Returns the line that <line> maps to under the dot map <dot_map>
+        """
+        rows, cols = self.rows, self.cols
+        dots = []
+
+        for dot in line_dots(rows, cols, line):
+            row, col = dot_map(dot // cols, dot % cols, rows, cols)
+            dots.append(row * cols + col)
+
+        return dots_line(rows, cols, dots[0], dots[1])
+
+    @staticmethod
+    def _chunk_table(perm, start):
+        """(tuple, int) -> tuple
+        Returns the images under <perm> of every setting of lines <start> to
+        <start> + _CHUNK - 1
+        """
+        table = [0] * (1 << _CHUNK)
+        lines = perm[start:start + _CHUNK]
+
+        for bits in range(1, 1 << min(_CHUNK, len(lines))):
+            low = bits & -bits
+            table[bits] = table[bits ^ low] | \
+                1 << lines[low.bit_length() - 1]
+
+        return tuple(table)
+
+    def _canonical_table(self, lines):
+        """(int) -> tuple
+        Returns the canonical form and the transform reaching it for every
+        position of the board, as array('I') and array('B')
+        """
+        keys = array('I', bytes(4 << lines))
+        transforms = array('B', bytes(1 << lines))
+
+        for position in range(1 << lines):
+            key, transform = position, 0
+            for index in range(1, len(self.permutations)):
+                image = self.transform(position, index)
+                if image < key:
+                    key, transform = image, index
+            keys[position] = key
+            transforms[position] = transform
+
+        return keys, transforms
+
+    def transform(self, lines, transform):
+        """(int, int) -> int
+        Returns the position <lines> transformed by <transform>
+        """
+        image = 0
+
+        for chunk in self._chunks[transform]:
+            if not lines:
+                break
+            image |= chunk[lines & _CHUNK_MASK]
+            lines >>= _CHUNK
+
+        return image
+
+    def canonical(self, lines):
+        """(int) -> tuple
+        Returns (canonical form, transform) of position <lines>; the
+        transform maps <lines> to its canonical form
+        """
+        if self._keys is not None:
+            return self._keys[lines], self._transforms[lines]
+
+        key, transform = lines, 0
+
+        for index in range(1, len(self.permutations)):
+            image = self.transform(lines, index)
+            if image < key:
+                key, transform = image, index
+
+        return key, transform
+
+    def map_line(self, line, transform):
+        """(int, int) -> int
+        Returns the line that <line> maps to under <transform>
+        """
+        return self.permutations[transform][line]
+
+    def restore_line(self, line, transform):
+        """(int, int) -> int
+        Returns the line of the original position that maps to <line> of
+        the position transformed by <transform>, e.g. the move to play for a
+        best move found for the canonical form
+        """
+        return self.permutations[self.inverses[transform]][line]
+
+    def canonical_positions(self):
+        """() -> generator
+        Yields, in increasing order, every position that is its own
+        canonical form
+        """
+        for position in range(1 << line_count(self.rows, self.cols)):
+            if self.canonical(position)[0] == position:
+                yield position
+
+
+# Symmetries by board size, made on first use
+_symmetries = {}
+
+def symmetry(rows=3, cols=3):
+    """(int, int) -> Symmetry
+    Returns the symmetries of a board of <rows> x <cols> dots
+    """
+    found = _symmetries.get((rows, cols))
+
+    if found is None:
+        found = _symmetries[rows, cols] = Symmetry(rows, cols)
+
+    return found
+
+def canonical(lines, rows=3, cols=3):
+    """(int, int, int) -> tuple
+    Returns (canonical form, transform) of the position <lines> on a board
+    of <rows> x <cols> dots
+    """
+    return symmetry(rows, cols).canonical(lines)
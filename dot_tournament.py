@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""Self-play tournaments between computer players
+
+Pits player strategies against each other, either every pair of players
+(round robin) or the first player against each of the others (gauntlet).
+Every pairing plays a number of games, alternating who moves first, and the
+games are shared out over a pool of worker processes.
+
+Each finished game is appended to a results file as one line of JSON:
+
+    {"game": "alphabeta|random|7", "x": "random", "y": "alphabeta",
+     "x_score": 1, "y_score": 3}
+
+A tournament started again with the same results file skips the games
+already in it, so an interrupted tournament resumes where it stopped.
+
+A player strategy is one of the names in PLAYERS, or 'module:callable' for
+a factory elsewhere. A factory is called as factory(rows, cols, seed) and
+returns an object whose choose_move(lines) method returns the line to add
+in the position <lines> (see dot_nxm_logic for the line numbering). A
+choose_move() that takes a <margin> keyword (as dot_mcts.MCTSPlayer does) is
+also given the lead of the player to move, in squares.
+
+Usage:
+    python3 dot_tournament.py RESULTS PLAYER PLAYER... [options]
+"""
+import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from importlib import import_module
+from inspect import signature
+from itertools import combinations
+from math import log
+from math import sqrt
+from random import Random
+from zlib import crc32
+
+from dot_ai import AlphaBetaPlayer
+from dot_mcts import MCTSPlayer
+from dot_nxm_logic import Board
+from dot_nxm_logic import bordering_masks
+from dot_nxm_logic import iter_lines
+from dot_nxm_logic import line_count
+from dot_nxm_logic import move_kinds
+
+# z for a 95% confidence interval
+_Z95 = 1.959964
+
+
+##############################################################################
+# NOTE: Player strategies
+#-----------------------------------------------------------------------------
+
+class RandomPlayer:
+    """Adds a random free line"""
+
+    def __init__(self, rows=3, cols=3, seed=None):
+        self._full = (1 << line_count(rows, cols)) - 1
+        self._rng = Random(seed)
+
+    def choose_move(self, lines):
+        free = self._full & ~lines
+        choices = [line for line in range(free.bit_length())
+                   if free >> line & 1]
+        return self._rng.choice(choices) if choices else None
+
+
+class GreedyPlayer:
+    """Completes a square when it can, otherwise adds a random line that
+    gives no square away, and gives one away only when it must
+    """
+
+    def __init__(self, rows=3, cols=3, seed=None):
+        lines = line_count(rows, cols)
+        self._full = (1 << lines) - 1
+        self._bordering = bordering_masks(rows, cols)
+        self._rng = Random(seed)
+
+    def choose_move(self, lines):
+        capturing, safe, others = move_kinds(self._bordering, lines,
+                                             self._full & ~lines)
+
+        if capturing:
+            return (capturing & -capturing).bit_length() - 1
+
+        choices = list(iter_lines(safe or others))
+        return self._rng.choice(choices) if choices else None
+
+
+# Solved boards shared by the SolverPlayers of this process: (rows, cols) ->
+# dot_3x3_solver.Solver
+_solvers = {}
+
+
+class SolverPlayer:
+    """Plays perfectly using dot_3x3_solver; small boards only. The board is
+    solved once per process and size"""
+
+    def __init__(self, rows=3, cols=3, seed=None):
+        from dot_3x3_solver import Solver
+
+        if (rows, cols) not in _solvers:
+            _solvers[rows, cols] = Solver(rows, cols)
+
+        self._solver = _solvers[rows, cols]
+
+    def choose_move(self, lines):
+        return self._solver.best_line(lines)
+
+
+# Built-in strategies: name -> factory(rows, cols, seed)
+PLAYERS = {
+    'random': RandomPlayer,
+    'greedy': GreedyPlayer,
+    'perfect': SolverPlayer,
+    'alphabeta': lambda rows, cols, seed: AlphaBetaPlayer(rows, cols),
+    'mcts': lambda rows, cols, seed: MCTSPlayer(rows, cols, playouts=2000,
+                                                time_limit=None, seed=seed),
+}
+
+
+def player_factory(name):
+    """(str) -> callable
+    Returns the factory of the strategy <name>, one of PLAYERS or
+    'module:callable'
+    """
+    if name in PLAYERS:
+        return PLAYERS[name]
+
+    module, sep, attribute = name.partition(':')
+
+    if not sep:
+        raise ValueError('Unknown player {0!r}'.format(name))
+
+    return getattr(import_module(module), attribute)
+
+
+##############################################################################
+# NOTE: Playing games
+#-----------------------------------------------------------------------------
+
+def play_game(task):
+    """(tuple) -> dict
+    Plays the game <task> = (game id, player X, player Y, rows, cols) and
+    returns its result record
+    """
+    game_id, x_name, y_name, rows, cols = task
+
+    # Fresh players seeded from the game id, so a game can be replayed from
+    # its id alone and the two sides of a self-pairing share no state
+    seed = crc32(game_id.encode())
+    players = {'X': player_factory(x_name)(rows, cols, seed),
+               'Y': player_factory(y_name)(rows, cols, seed + 1)}
+
+    # Players that weigh the squares already won are told the mover's lead
+    scored = {player: 'margin' in signature(
+                  players[player].choose_move).parameters
+              for player in players}
+
+    board = Board(rows, cols)
+    lines = 0
+
+    while board.winner() is None:
+        mover = board.current_player()
+
+        if scored[mover]:
+            x_score, y_score = board.score()
+            margin = x_score - y_score if mover == 'X' else y_score - x_score
+            line = players[mover].choose_move(lines, margin=margin)
+        else:
+            line = players[mover].choose_move(lines)
+
+        if not board.add_line(line):
+            raise RuntimeError('{0} chose the illegal line {1!r}'.format(
+                board.current_player(), line))
+
+        lines |= 1 << line
+
+    x_score, y_score = board.score()
+    return {'game': game_id, 'x': x_name, 'y': y_name,
+            'x_score': x_score, 'y_score': y_score}
+
+
+def schedule(players, games, gauntlet=False):
+    """(list, int, bool) -> list
+    Returns the ids and players, (game id, player X, player Y), of every
+    game in a tournament of <players> where each pairing plays <games>
+    games. With <gauntlet>, the first player meets each of the others,
+    otherwise every pair meets. The players take turns moving first
+    """
+    if gauntlet:
+        pairings = [(players[0], other) for other in players[1:]]
+    else:
+        pairings = list(combinations(players, 2))
+
+    tasks = []
+
+    for first, second in pairings:
+        for number in range(games):
+            game_id = '{0}|{1}|{2}'.format(first, second, number)
+            if number % 2:
+                tasks.append((game_id, second, first))
+            else:
+                tasks.append((game_id, first, second))
+
+    return tasks
+
+
+def read_results(path):
+    """(str) -> list
+    Returns the result records in the results file <path>; a record cut
+    short by an interruption is ignored
+    """
+    results = []
+
+    if not os.path.exists(path):
+        return results
+
+    with open(path) as results_file:
+        for line in results_file:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                pass
+
+    return results
+
+
+def _ends_with_newline(path):
+    """(str) -> bool
+    Returns True if the file <path> ends with a newline
+    """
+    with open(path, 'rb') as results_file:
+        results_file.seek(-1, os.SEEK_END)
+        return results_file.read(1) == b'\n'
+
+
+def run(path, players, games=10, rows=3, cols=3, gauntlet=False,
+        workers=None):
+    """(str, list, int, int, int, bool, int) -> list
+    Plays the tournament of <players> on a board of <rows> x <cols> dots,
+    appending each result to the file <path> as soon as the game ends.
+    Games already in the file are not played again.
+    Returns all the results in the file
+    """
+    for name in players:
+        player_factory(name)    # Fail early on unknown players
+
+    results = read_results(path)
+    finished = {result['game'] for result in results}
+    pending = deque((game_id, x_name, y_name, rows, cols)
+                    for game_id, x_name, y_name
+                    in schedule(players, games, gauntlet)
+                    if game_id not in finished)
+
+    workers = workers or os.cpu_count() or 1
+
+    # Keep every worker busy, but only a few games queued ahead of them
+    with ProcessPoolExecutor(workers) as pool, \
+            open(path, 'a') as results_file:
+        running = set()
+
+        # Start on a fresh line after a record cut short
+        if results_file.tell() and not _ends_with_newline(path):
+            results_file.write('\n')
+
+        while pending or running:
+            while pending and len(running) < 2 * workers:
+                running.add(pool.submit(play_game, pending.popleft()))
+
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                result = future.result()
+                results_file.write(json.dumps(result) + '\n')
+                results_file.flush()
+                results.append(result)
+
+    return results
+
+
+##############################################################################
+# NOTE: Reporting
+#-----------------------------------------------------------------------------
+
+def wilson_interval(score, games):
+    """(float, int) -> tuple
+    Returns the 95% confidence interval of a score rate, <score> points
+    from <games> games
+    """
+    if not games:
+        return 0.0, 1.0
+
+    rate = score / games
+    denominator = 1 + _Z95 ** 2 / games
+    centre = rate + _Z95 ** 2 / (2 * games)
+    spread = _Z95 * sqrt(rate * (1 - rate) / games +
+                         _Z95 ** 2 / (4 * games ** 2))
+
+    return (centre - spread) / denominator, (centre + spread) / denominator
+
+
+def elo_ratings(results, iterations=200):
+    """(list, int) -> dict
+    Fits Elo ratings, averaging 0, to the <results> by maximum likelihood
+    (a draw counts half a win for each player).
+    Returns {player: (rating, 95% margin of error)}
+    """
+    names = sorted({result['x'] for result in results} |
+                   {result['y'] for result in results})
+    points = {name: 0.0 for name in names}
+    meetings = {}
+
+    for result in results:
+        x_name, y_name = result['x'], result['y']
+        if result['x_score'] > result['y_score']:
+            points[x_name] += 1.0
+        elif result['x_score'] < result['y_score']:
+            points[y_name] += 1.0
+        else:
+            points[x_name] += 0.5
+            points[y_name] += 0.5
+
+        pair = tuple(sorted((x_name, y_name)))
+        meetings[pair] = meetings.get(pair, 0) + 1
+
+    opponents = {name: [] for name in names}
+    for (first, second), count in meetings.items():
+        opponents[first].append((second, count))
+        opponents[second].append((first, count))
+
+    # Minorization-maximization for the Bradley-Terry strengths. Every
+    # player also draws one virtual game against a player of strength 1,
+    # which keeps unbeaten and winless players finite
+    strength = {name: 1.0 for name in names}
+
+    for _ in range(iterations):
+        for name in names:
+            denominator = sum(count / (strength[name] + strength[other])
+                              for other, count in opponents[name])
+            denominator += 1 / (strength[name] + 1)
+            strength[name] = (points[name] + 0.5) / denominator
+
+    scale = 400 / log(10)
+    ratings = {name: scale * log(strength[name]) for name in names}
+    mean = sum(ratings.values()) / len(ratings) if ratings else 0.0
+
+    report = {}
+
+    for name in names:
+        information = sum(count * strength[name] * strength[other] /
+                          (strength[name] + strength[other]) ** 2
+                          for other, count in opponents[name])
+        margin = _Z95 * scale / sqrt(information) if information else \
+                float('inf')
+        report[name] = (ratings[name] - mean, margin)
+
+    return report
+
+
+def standings(results):
+    """(list) -> list
+    Returns one row per player, best rated first:
+    (player, games, wins, draws, losses, score rate, interval low,
+    interval high, Elo, Elo margin of error)
+    """
+    tally = {}
+
+    for result in results:
+        for name, own, other in ((result['x'], result['x_score'],
+                                  result['y_score']),
+                                 (result['y'], result['y_score'],
+                                  result['x_score'])):
+            wins, draws, losses = tally.get(name, (0, 0, 0))
+            if own > other:
+                wins += 1
+            elif own < other:
+                losses += 1
+            else:
+                draws += 1
+            tally[name] = (wins, draws, losses)
+
+    ratings = elo_ratings(results)
+    rows = []
+
+    for name, (wins, draws, losses) in tally.items():
+        games = wins + draws + losses
+        score = wins + 0.5 * draws
+        low, high = wilson_interval(score, games)
+        rating, margin = ratings[name]
+        rows.append((name, games, wins, draws, losses, score / games,
+                     low, high, rating, margin))
+
+    rows.sort(key=lambda row: row[8], reverse=True)
+    return rows
+
+
+def format_standings(rows):
+    """(list) -> str
+    Returns the standings <rows> as a text table
+    """
+    lines = ['{0:<16}{1:>7}{2:>7}{3:>7}{4:>7}{5:>8}{6:>17}{7:>14}'.format(
+        'Player', 'Games', 'Won', 'Drawn', 'Lost', 'Score', '95% interval',
+        'Elo')]
+
+    for name, games, wins, draws, losses, rate, low, high, rating, margin \
+            in rows:
+        lines.append('{0:<16}{1:>7}{2:>7}{3:>7}{4:>7}{5:>8.1%}'
+                     '   {6:>6.1%} - {7:>5.1%}{8:>8.0f} +/-{9:<4.0f}'.format(
+                         name, games, wins, draws, losses, rate, low, high,
+                         rating, margin))
+
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Play a tournament between computer players')
+    parser.add_argument('results', help='results file (JSON lines)')
+    parser.add_argument('players', nargs='+',
+                        help='strategies: {0} or module:callable'.format(
+                            ', '.join(sorted(PLAYERS))))
+    parser.add_argument('--games', type=int, default=10,
+                        help='games per pairing (default 10)')
+    parser.add_argument('--rows', type=int, default=3)
+    parser.add_argument('--cols', type=int, default=3)
+    parser.add_argument('--gauntlet', action='store_true',
+                        help='first player meets each of the others')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    arguments = parser.parse_args()
+
+    if len(arguments.players) < 2:
+        parser.error('A tournament needs at least two players')
+
+    tournament = run(arguments.results, arguments.players, arguments.games,
+                     arguments.rows, arguments.cols, arguments.gauntlet,
+                     arguments.workers)
+    print(format_standings(standings(tournament)))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Bulk validation of recorded games
+
+Replays recorded games through the rules of dot_3x3_logic and reports the
+games that break them. A game is rejected when:
+
+    ILLEGAL_LINE   a move is not a line on the board
+    REPEATED_LINE  a move adds a line that already exists
+    WRONG_SCORE    the recorded squares of player X or player Y differ from
+                   the squares each captured in the replay (turn order
+                   follows from the rules: a player who completes a square
+                   moves again, otherwise the other player moves)
+    WRONG_RESULT   the recorded result is not the winner of the replay, or
+                   None for a game whose board is not full
+    WRONG_BOARD    the game is not on the board size being validated
+
+Games are validated in chunks across a pool of worker processes. Each
+worker maps an archive (see dot_archive) itself, so only game numbers
+cross between processes; games from a record stream (see dot_record) are
+sent in batches.
+
+Usage:
+    python3 dot_validate.py ARCHIVE_OR_RECORDS [--workers N] [--report FILE]
+"""
+import argparse
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from dot_archive import Archive
+from dot_nxm_logic import bordering_masks
+from dot_nxm_logic import line_count
+from dot_nxm_logic import square_count
+from dot_nxm_logic import square_masks
+from dot_record import RESULT_CODES
+from dot_record import read_records
+
+# Reasons for rejecting a game
+ILLEGAL_LINE, REPEATED_LINE, WRONG_SCORE, WRONG_RESULT, WRONG_BOARD = \
+        1, 2, 3, 4, 5
+
+REASONS = {ILLEGAL_LINE: 'illegal line', REPEATED_LINE: 'repeated line',
+           WRONG_SCORE: 'wrong score', WRONG_RESULT: 'wrong result',
+           WRONG_BOARD: 'wrong board'}
+
+# Games validated per task
+CHUNK = 1 << 15
+
+# Boards with at most this many lines replay through a table of completed
+# squares indexed by bitboard
+_TABLE_LINES = 16
+
+
+class Rules:
+    """Replays games on a board of <rows> x <cols> dots"""
+
+    def __init__(self, rows=3, cols=3):
+        self.rows = rows
+        self.cols = cols
+        self.lines = line_count(rows, cols)
+        self.squares = square_count(rows, cols)
+        self._bordering = bordering_masks(rows, cols)
+
+        if self.lines <= _TABLE_LINES:
+            masks = square_masks(rows, cols)
+            self._completed = bytes(
+                sum(1 for mask in masks if position & mask == mask)
+                for position in range(1 << self.lines))
+        else:
+            self._completed = None
+
+    def check(self, moves, result, x_score, y_score):
+        """(sequence, int, int, int) -> int
+        Replays <moves> and returns 0 if the game matches its recorded
+        result code and scores, otherwise the reason it does not
+        """
+        lines = 0
+        turn = 0
+        counts = [0, 0]
+        completed = self._completed
+        before = 0
+
+        for line in moves:
+            if not 0 <= line < self.lines:
+                return ILLEGAL_LINE
+
+            bit = 1 << line
+
+            if lines & bit:
+                return REPEATED_LINE
+
+            lines |= bit
+
+            if completed is not None:
+                after = completed[lines]
+                gained = after - before
+                before = after
+            else:
+                gained = 0
+                for mask in self._bordering[line]:
+                    if lines & mask == mask:
+                        gained += 1
+
+            if gained:
+                counts[turn] += gained
+            else:
+                turn ^= 1
+
+        if counts[0] != x_score or counts[1] != y_score:
+            return WRONG_SCORE
+
+        if x_score + y_score < self.squares:
+            expected = RESULT_CODES[None]
+        elif x_score > y_score:
+            expected = RESULT_CODES['X']
+        elif x_score < y_score:
+            expected = RESULT_CODES['Y']
+        else:
+            expected = RESULT_CODES['Draw']
+
+        if result != expected:
+            return WRONG_RESULT
+
+        return 0
+
+
+# Worker state: the rules and archive last used in this process
+_rules = None
+_archive = None
+
+def _worker_rules(rows, cols):
+    """(int, int) -> Rules
+    Returns the rules for the board size, reusing them between tasks
+    """
+    global _rules
+
+    if _rules is None or (_rules.rows, _rules.cols) != (rows, cols):
+        _rules = Rules(rows, cols)
+
+    return _rules
+
+def _check_archive(directory, start, stop):
+    """(str, int, int) -> tuple
+    Validates games <start> to <stop> - 1 of the archive <directory>.
+    Returns (game ids, reasons) of the rejected games, as bytes of
+    array('Q') and array('B')
+    """
+    global _archive
+
+    if _archive is None or _archive[0] != directory:
+        _archive = (directory, Archive(directory, indexes=False))
+
+    archive = _archive[1]
+    rules = _worker_rules(archive.rows, archive.cols)
+    offsets, moves = archive.offsets, archive.moves
+    results, x_scores, y_scores = \
+            archive.results, archive.x_scores, archive.y_scores
+    ids, reasons = array('Q'), array('B')
+
+    for game in range(start, stop):
+        reason = rules.check(moves[offsets[game]:offsets[game + 1]],
+                             results[game], x_scores[game], y_scores[game])
+        if reason:
+            ids.append(game)
+            reasons.append(reason)
+
+    return ids.tobytes(), reasons.tobytes()
+
+def _check_records(rows, cols, first, games):
+    """(int, int, int, list) -> tuple
+    Validates <games>, (rows, cols, result code, x_score, y_score, moves)
+    tuples numbered from <first>.
+    Returns (game ids, reasons) like _check_archive()
+    """
+    rules = _worker_rules(rows, cols)
+    ids, reasons = array('Q'), array('B')
+
+    for game, (game_rows, game_cols, result, x_score, y_score, moves) \
+            in enumerate(games, first):
+        if (game_rows, game_cols) != (rows, cols):
+            reason = WRONG_BOARD
+        else:
+            reason = rules.check(moves, result, x_score, y_score)
+
+        if reason:
+            ids.append(game)
+            reasons.append(reason)
+
+    return ids.tobytes(), reasons.tobytes()
+
+
+class Report:
+    """The rejected games of a validation run: parallel arrays of game ids
+    (<ids>) and reasons (<reasons>), in game order, and the number of games
+    checked (<games>)
+    """
+
+    def __init__(self, games=0):
+        self.games = games
+        self.ids = array('Q')
+        self.reasons = array('B')
+
+    def add(self, ids, reasons):
+        """(bytes, bytes) -> NoneType
+        Adds the rejected games returned by a worker
+        """
+        self.ids.frombytes(ids)
+        self.reasons.frombytes(reasons)
+
+    def summary(self):
+        """() -> str
+        Returns a short description of the report
+        """
+        lines = ['{0} games checked, {1} rejected'.format(self.games,
+                                                          len(self.ids))]
+
+        for reason, name in sorted(REASONS.items()):
+            count = self.reasons.count(reason)
+            if count:
+                lines.append('    {0}: {1}'.format(name, count))
+
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """(str) -> NoneType
+        Writes the rejected games to the text file <path>, one
+        'game id<TAB>reason' line each
+        """
+        with open(path, 'w') as out:
+            for game, reason in zip(self.ids, self.reasons):
+                out.write('{0}\t{1}\n'.format(game, REASONS[reason]))
+
+
+def validate_archive(directory, workers=None):
+    """(str, int) -> Report
+    Validates every game in the archive <directory>
+    """
+    with Archive(directory, indexes=False) as archive:
+        games = len(archive)
+
+    report = Report(games)
+
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        chunks = [pool.submit(_check_archive, directory, start,
+                              min(start + CHUNK, games))
+                  for start in range(0, games, CHUNK)]
+
+        for chunk in chunks:
+            report.add(*chunk.result())
+
+    return report
+
+
+def validate_records(path, rows=None, cols=None, workers=None):
+    """(str, int, int, int) -> Report
+    Validates every game in the record stream <path>. Games must be on a
+    board of <rows> x <cols> dots, by default the size of the first game
+    """
+    report = Report()
+    workers = workers or os.cpu_count() or 1
+
+    with open(path, 'rb') as stream, ProcessPoolExecutor(workers) as pool:
+        records = read_records(stream)
+        running = []
+
+        while True:
+            batch = [(record.rows, record.cols, RESULT_CODES[record.result],
+                      record.x_score, record.y_score, record.moves)
+                     for record in islice(records, CHUNK)]
+
+            if not batch:
+                break
+
+            if rows is None:
+                rows, cols = batch[0][0], batch[0][1]
+
+            running.append(pool.submit(_check_records, rows, cols,
+                                       report.games, batch))
+            report.games += len(batch)
+
+            # Collect results in order, keeping a few batches in flight
+            while len(running) > 2 * workers:
+                report.add(*running.pop(0).result())
+
+        for chunk in running:
+            report.add(*chunk.result())
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate recorded games')
+    parser.add_argument('games',
+                        help='archive directory or game record stream')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--report', metavar='FILE',
+                        help='write the rejected games to this file')
+    arguments = parser.parse_args()
+
+    if os.path.isdir(arguments.games):
+        outcome = validate_archive(arguments.games, arguments.workers)
+    else:
+        outcome = validate_records(arguments.games,
+                                   workers=arguments.workers)
+
+    print(outcome.summary())
+
+    if arguments.report:
+        outcome.write(arguments.report)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Tests of dot_archive
+
+Usage:
+    python3 -m unittest test_dot_archive
+"""
+import tempfile
+import unittest
+from random import Random
+
+from dot_archive import Archive
+from dot_archive import build
+from dot_record import make_record
+from dot_validate import WRONG_SCORE
+from dot_validate import validate_archive
+
+
+def random_games(count, seed=0):
+    """(int, int) -> list
+    Returns the records of <count> games of random lines on the 3x3 board
+    """
+    rng = Random(seed)
+    games = []
+
+    for _ in range(count):
+        moves = list(range(12))
+        rng.shuffle(moves)
+        games.append(make_record(moves))
+
+    return games
+
+
+class ArchiveQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.games = random_games(200)
+        build(self.directory.name, self.games)
+        self.archive = Archive(self.directory.name)
+
+    def tearDown(self):
+        self.archive.close()
+        self.directory.cleanup()
+
+    def test_games_with_result_in_order(self):
+        for result in ('X', 'Y', 'Draw'):
+            expected = [game for game, record in enumerate(self.games)
+                        if record.result == result]
+            found = list(self.archive.games_with_result(result))
+
+            # Mixed first captures, so grouping by them would reorder ids
+            captures = set(self.archive.first_capture[game]
+                           for game in expected)
+            self.assertGreater(len(captures), 1)
+            self.assertEqual(found, expected)
+
+    def test_games_with_result_and_first_capture(self):
+        for result in ('X', 'Y', 'Draw'):
+            for first, code in (('X', 1), ('Y', 2)):
+                expected = [game for game, record in enumerate(self.games)
+                            if record.result == result and
+                            self.archive.first_capture[game] == code]
+                found = list(self.archive.games_with_result(result, first))
+                self.assertEqual(found, expected)
+
+
+class ArchiveBuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_oversized_score_is_archived_and_rejected(self):
+        games = random_games(3)
+        games[1] = games[1]._replace(x_score=70000)
+
+        self.assertEqual(build(self.directory.name, games), 3)
+
+        with Archive(self.directory.name) as archive:
+            self.assertEqual(archive.x_scores[1], 0xFFFF)
+            self.assertEqual(archive.x_scores[0], games[0].x_score)
+
+        report = validate_archive(self.directory.name, workers=1)
+        self.assertEqual(list(report.ids), [1])
+        self.assertEqual(list(report.reasons), [WRONG_SCORE])
+
+
+if __name__ == '__main__':
+    unittest.main()
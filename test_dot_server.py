@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Tests of dot_server
+
+Usage:
+    python3 -m unittest test_dot_server
+"""
+import asyncio
+import unittest
+
+from dot_server import GameServer
+from dot_server import _LINE_LIMIT
+
+
+class LobbyTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = GameServer(port=0)
+        await self.server.start()
+        self.clients = []
+
+    async def asyncTearDown(self):
+        for _, writer in self.clients:
+            writer.close()
+        await self.server.close()
+
+    async def connect(self):
+        reader, writer = await asyncio.open_connection('localhost',
+                                                       self.server.port)
+        self.clients.append((reader, writer))
+        return reader, writer
+
+    async def wait_for_lobby(self):
+        while self.server._waiting is None:
+            await asyncio.sleep(0.01)
+        return self.server._waiting
+
+    async def test_overlong_line_leaves_lobby(self):
+        _, writer = await self.connect()
+        waiting = await self.wait_for_lobby()
+
+        writer.write(b'x' * (4 * _LINE_LIMIT) + b'\n')
+        await writer.drain()
+
+        # The lobby gives the client up before its handler closes it
+        self.assertIsNone(await waiting.lobby)
+        self.assertIsNot(self.server._waiting, waiting)
+
+        reader, _ = await self.connect()
+        self.assertEqual(await reader.readline(), b'Connect the dots (3x3)\n')
+        self.assertEqual(await reader.readline(), b'Waiting for an opponent\n')
+        self.assertEqual(self.server.games, 0)
+
+    async def test_watch_leaves_lobby(self):
+        _, writer = await self.connect()
+        waiting = await self.wait_for_lobby()
+
+        writer.write(b'WATCH 7\n')
+        await writer.drain()
+
+        self.assertEqual(await waiting.lobby, 7)
+        self.assertIsNot(self.server._waiting, waiting)
+
+
+if __name__ == '__main__':
+    unittest.main()